@@ -311,6 +311,7 @@ def _applyTransform(table, transform):
     peakmap = peakmaps.pop()
     for spec in peakmap.spectra:
         spec.peaks[:, 0] = transform(spec.peaks[:, 0])
+    peakmap._invalidate_columns()
     table.replaceColumn("peakmap", peakmap)
     table.meta["mz_aligned"] = True
     return table
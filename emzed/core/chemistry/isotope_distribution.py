@@ -140,7 +140,7 @@ class IsotopeDistributionGenerator(object):
         massrange = np.arange(minMass - w2, maxMass + w2, 1e-7)
         measured = self.measuredIntensity(massrange)
         dd = np.diff(measured)
-        w = np.where((dd[:-1] > 0) * (dd[1:] < 0))[0] + 1
+        w = np.flatnonzero((dd[:-1] > 0) & (dd[1:] < 0)) + 1
         mzs = massrange[w]
         abundances = measured[w]
         return zip(mzs, [self.formula] * len(mzs), abundances)
@@ -29,8 +29,9 @@ def gt(a, x):
 
 
 def none_in_array(v):
-    return None in v.tolist()
-    return v.dtype == object
+    # arrays with numerical dtype can not hold None, so we avoid the conversion to
+    # a list in this case:
+    return v.dtype == object and None in v.tolist()
 
 
 def find_nones(v):
@@ -888,7 +889,7 @@ class BinaryExpression(BaseExpression):
             else:
                 nones = None
                 res = self.efun(lvals, rvals)
-            res = res.astype(ct)  # downcast: 2/3 -> 0 for int
+            res = res.astype(ct, copy=False)  # downcast: 2/3 -> 0 for int
             if nones is not None:
                 res = res.astype(object)  # allows None values
                 res[nones] = None
@@ -1302,7 +1303,11 @@ class ColumnExpression(BaseExpression):
     def _setupValues(self):
         # delayed lazy evaluation
         if not hasattr(self, "_values"):
-            self._values = tuple(row[self.idx] for row in self.table.rows)
+            self._values = self.table._columnValues(self.idx)
+
+    def _resetValues(self):
+        if hasattr(self, "_values"):
+            del self._values
 
     @property
     def values(self):
@@ -1326,19 +1331,14 @@ class ColumnExpression(BaseExpression):
         # self.values is always a list ! for speeding up things
         # we convert numerical types to np.ndarray during evaluation
         # of expressions
-        if ctx is None:
+        if ctx is None or ctx.get(self.table) is None:
             if self.type_ in _basic_num_types:
                 # the dtype of the following array is determined
-                # automatically, even if Nones are in values:
-                return np.array(self.values), None, self.type_
+                # automatically, even if Nones are in values. we copy the
+                # cached array of the table, as the result may be modified:
+                return self.table._columnArray(self.idx).copy(), None, self.type_
             return self.values, None, self.type_
         cx = ctx.get(self.table)
-        if cx is None:
-            if self.type_ in _basic_num_types:
-                # the dtype of the following array is determined
-                # automatically, even if Nones are in values:
-                return np.array(self.values), None, self.type_
-            return self.values, None, self.type_
         values, idx, type_ = cx.get(self.colname)
         if type_ in _basic_num_types:
             values = np.array(values)
@@ -1372,8 +1372,7 @@ class ColumnExpression(BaseExpression):
         """
 
         self.table.replaceColumn(self.colname, map(operation, self.values))
-        if hasattr(self, "_values"):
-            del self._values
+        self._resetValues()
 
     def __iadd__(self, value):
         """
@@ -4,6 +4,7 @@ import numpy as np
 import os.path
 import copy
 import hashlib
+import struct
 from collections import defaultdict
 import warnings
 
@@ -15,16 +16,60 @@ except:
     pass
 
 
+# binary representations of floats for computing unique ids:
+_pack_float = struct.Struct("<d").pack
+_pack_float_pair = struct.Struct("<dd").pack
+
+
 def deprecation(message):
     warnings.warn(message, UserWarning, stacklevel=2)
 
 
+def _index_range(values, vmin, vmax):
+    """returns imin, imax such that values[imin:imax] are the entries of the sorted array
+    values with vmin <= value <= vmax. limits which are None are not considered.
+
+    searchsorted converts the full array if the type of the search key differs from the
+    arrays dtype, so we search with keys of the arrays dtype and choose the side of the
+    search such that the result is the same as for comparing with the given limits.
+    """
+    type_ = values.dtype.type
+    if vmin is None:
+        imin = 0
+    else:
+        key = type_(vmin)
+        imin = values.searchsorted(key, side="left" if float(key) >= vmin else "right")
+    if vmax is None:
+        imax = len(values)
+    else:
+        key = type_(vmax)
+        imax = values.searchsorted(key, side="right" if float(key) <= vmax else "left")
+    return imin, imax
+
+
+def _in_range(values, vmin, vmax):
+    """returns a boolean mask for vmin <= value <= vmax which agrees with _index_range.
+
+    numpy compares a float32 array with a python float in float32, so we compare with
+    keys of the arrays dtype and choose strict or non strict comparison as in
+    _index_range.
+    """
+    type_ = values.dtype.type
+    key = type_(vmin)
+    mask = (values >= key) if float(key) >= vmin else (values > key)
+    key = type_(vmax)
+    mask &= (values <= key) if float(key) <= vmax else (values < key)
+    return mask
+
+
 class Spectrum(object):
 
     """
         MS Spectrum Type
     """
 
+    __slots__ = ("peaks", "rt", "msLevel", "polarity", "precursors", "meta")
+
     def __init__(self, peaks, rt, msLevel, polarity, precursors=None, meta=None):
         """
            peaks:      n x 2 matrix
@@ -61,13 +106,27 @@ class Spectrum(object):
         peaks = peaks[peaks[:, 1] > 0]  # remove zero intensities
         # sort resp. mz values:
         perm = np.argsort(peaks[:, 0])
-        self.peaks = peaks[perm, :].astype(np.float32)
+        # column major layout: the m/z and intensity columns are contiguous arrays,
+        # which speeds up searching and summing them:
+        self.peaks = np.asfortranarray(peaks[perm, :], dtype=np.float32)
         self.rt = rt
         self.msLevel = msLevel
         self.polarity = polarity
         self.precursors = precursors
         self.meta = meta
 
+    def _copyWithPeaks(self, peaks):
+        """creates a copy with given peaks, which must be sorted by m/z and must not
+        contain zero intensities. other attributes are copied shallow"""
+        spec = Spectrum.__new__(Spectrum)
+        spec.peaks = peaks
+        spec.rt = self.rt
+        spec.msLevel = self.msLevel
+        spec.polarity = self.polarity
+        spec.precursors = list(self.precursors)
+        spec.meta = dict(self.meta)
+        return spec
+
     def __eq__(self, other):
 
         if self is other:
@@ -82,14 +141,14 @@ class Spectrum(object):
     def uniqueId(self):
         if "unique_id" not in self.meta:
             h = hashlib.sha256()
-            # peaks.data is binary representation of numpy array peaks:
-            h.update("%.6e" % self.rt)
+            h.update(_pack_float(self.rt))
             h.update(str(self.msLevel))
-            h.update(str(self.peaks.data))
+            # hash raw buffer in c order without creating an intermediate string, this
+            # also makes the id independent of the memory layout of peaks:
+            h.update(np.ascontiguousarray(self.peaks).data)
             h.update(str(self.polarity))
             for mz, ii in self.precursors:
-                h.update("%.6e" % mz)
-                h.update("%.6e" % ii)
+                h.update(_pack_float_pair(mz, ii))
             self.meta["unique_id"] = h.hexdigest()
         return self.meta["unique_id"]
 
@@ -119,7 +178,10 @@ class Spectrum(object):
 
     def intensityInRange(self, mzmin, mzmax):
         """summed up intensities in given m/z range"""
-        return self.peaksInRange(mzmin, mzmax)[:, 1].sum()
+        peaks = self.peaks
+        imin, imax = _index_range(peaks[:, 0], mzmin, mzmax)
+        # np.add.reduce avoids the python level wrapper of ndarray.sum:
+        return np.add.reduce(peaks[imin:imax, 1])
 
     def peaksInRange(self, mzmin=None, mzmax=None):
         """peaks in given m/z range as n x 2 matrix
@@ -127,20 +189,9 @@ class Spectrum(object):
            first column:   m/z values
            second column:  intenisities
         """
-        mzs = None
-        if mzmin is not None or mzmax is not None:
-            mzs = self.peaks[:, 0]
         if mzmin is None and mzmax is None:
             raise Exception("no limits provided. need mzmin or mzmax")
-        if mzmin is not None:
-            imin = mzs.searchsorted(mzmin)
-        else:
-            imin = 0
-        if mzmax is not None:
-            imax = mzs.searchsorted(mzmax, side='right')
-        else:
-            # exclusive:
-            imax = self.peaks.shape[0]
+        imin, imax = _index_range(self.peaks[:, 0], mzmin, mzmax)
         return self.peaks[imin:imax]
 
     def mzRange(self):
@@ -187,12 +238,62 @@ class Spectrum(object):
         spec.set_peaks(self.peaks)
         return spec
 
+    def __getstate__(self):
+        # same state as pickled by older versions which had no __slots__:
+        return dict((name, getattr(self, name)) for name in Spectrum.__slots__)
+
     def __setstate__(self, state):
-        self.__dict__ = state
+        for name in Spectrum.__slots__:
+            if name in state:
+                setattr(self, name, state[name])
+        # spectra pickled by older versions have peaks in row major layout:
+        self.peaks = np.asfortranarray(self.peaks)
         if not hasattr(self, "meta"):
             self.meta = dict()
 
 
+class _PeakMapColumns(object):
+
+    """
+        columnar representation of the spectra of a peakmap: one array per
+        attribute, and the peaks of all spectra concatenated to flat m/z and
+        intensity arrays. the peaks of spectrum i are located in the range
+        offsets[i]:offsets[i + 1].
+    """
+
+    def __init__(self, spectra):
+        n = len(spectra)
+        self.rts = np.fromiter((s.rt for s in spectra), dtype=np.float64, count=n)
+        self.ms_levels = np.fromiter((s.msLevel for s in spectra), dtype=np.int8, count=n)
+        self.polarities = np.array([s.polarity for s in spectra], dtype="S1")
+        sizes = np.fromiter((len(s.peaks) for s in spectra), dtype=np.int64, count=n)
+        self.offsets = np.zeros((n + 1,), dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+        if n:
+            self.mzs = np.concatenate([s.peaks[:, 0] for s in spectra])
+            self.intensities = np.concatenate([s.peaks[:, 1] for s in spectra])
+        else:
+            self.mzs = np.zeros((0,), dtype=np.float32)
+            self.intensities = np.zeros((0,), dtype=np.float32)
+        # rt values are sorted unless they were modified after creating the peakmap:
+        self.rts_sorted = bool(np.all(self.rts[:-1] <= self.rts[1:]))
+        # results of queries which only depend on the columns above:
+        self.derived = dict()
+
+    def indices_in_rt_range(self, rtmin, rtmax):
+        """returns ascending indices of spectra with rtmin <= rt <= rtmax. limits which are
+        None are not considered."""
+        if self.rts_sorted:
+            imin, imax = _index_range(self.rts, rtmin, rtmax)
+            return np.arange(imin, imax)
+        keep = np.ones(self.rts.shape, dtype=bool)
+        if rtmin is not None:
+            keep &= rtmin <= self.rts
+        if rtmax is not None:
+            keep &= self.rts <= rtmax
+        return np.flatnonzero(keep)
+
+
 class PeakMap(object):
     """
         This is the container object for spectra of type :ref:Spectrum.
@@ -210,15 +311,25 @@ class PeakMap(object):
 
             meta    : dictionary of meta values
         """
+        self._columns_cache = None
         try:
-            self.spectra = sorted(spectra, key=lambda spec: spec.rt)
+            spectra = list(spectra)
+            # spectra from files are usually sorted by rt already, checking this is
+            # much faster than sorting:
+            rts = np.fromiter((spec.rt for spec in spectra), dtype=np.float64,
+                              count=len(spectra))
+            if not np.all(rts[:-1] <= rts[1:]):
+                spectra.sort(key=lambda spec: spec.rt)
+            self.spectra = spectra
         except:
             raise Exception("spectra param is not iterable")
 
         if meta is None:
             meta = dict()
         self.meta = meta
-        polarities = set(spec.polarity for spec in spectra)
+        # one pass over the materialized list, a set comprehension is faster than
+        # comparing each polarity with the first one in a generator expression:
+        polarities = {spec.polarity for spec in spectra}
         if len(polarities) > 1:
             print
             print "INCONSISTENT POLARITIES"
@@ -232,8 +343,52 @@ class PeakMap(object):
         else:
             self.polarity = None
 
+    def __getstate__(self):
+        # the cached columns can be recomputed and would double the size of pickles:
+        state = self.__dict__.copy()
+        state.pop("_columns_cache", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+        self._columns_cache = None
+
+    def _columns(self):
+        """returns columnar representation of self.spectra. the result is cached as long
+        as self.spectra holds the same spectra with the same rt, msLevel, polarity and
+        peaks objects. checking this is much cheaper than building the columns.
+
+        in place modifications of peak arrays are not detected, code which does this
+        must call _invalidate_columns() afterwards.
+        """
+        spectra = self.spectra
+        state = [(s.rt, s.msLevel, s.polarity, id(s.peaks)) for s in spectra]
+        cache = self._columns_cache
+        # comparing lists checks the identity of the items first, which is fast:
+        if cache is None or cache[0] != spectra or cache[1] != state:
+            # we keep the peaks alive, so other arrays can not get the same id():
+            peaks = [s.peaks for s in spectra]
+            cache = self._columns_cache = (list(spectra), state, peaks,
+                                           _PeakMapColumns(spectra))
+        return cache[3]
+
+    def _invalidate_columns(self):
+        self._columns_cache = None
+
+    def _stackedPeaks(self, ix):
+        """returns peaks of spectra with indices ix as one n x 2 matrix"""
+        columns = self._columns()
+        selected = np.zeros((len(self.spectra),), dtype=bool)
+        selected[ix] = True
+        use = np.repeat(selected, np.diff(columns.offsets))
+        mzs = columns.mzs[use]
+        peaks = np.empty((len(mzs), 2), dtype=np.result_type(mzs, columns.intensities))
+        peaks[:, 0] = mzs
+        peaks[:, 1] = columns.intensities[use]
+        return peaks
+
     def all_peaks(self, msLevel=1):
-        return np.vstack((s.peaks for s in self.spectra if s.msLevel == msLevel))
+        return self._stackedPeaks(self._columns().ms_levels == msLevel)
 
     def extract(self, rtmin=None, rtmax=None, mzmin=None, mzmax=None,
                 mslevelmin=None, mslevelmax=None):
@@ -251,39 +406,60 @@ class PeakMap(object):
         \
         """
 
-        spectra = copy.deepcopy(self.spectra)
-
+        columns = self._columns()
+        # rt limits 0.0 are not considered:
+        ix = columns.indices_in_rt_range(rtmin or None, rtmax or None)
+        levels = columns.ms_levels[ix]
+        keep = np.ones(ix.shape, dtype=bool)
         if mslevelmin is not None:
-            spectra = [s for s in spectra if s.msLevel >= mslevelmin]
+            keep &= levels >= mslevelmin
         if mslevelmax is not None:
-            spectra = [s for s in spectra if s.msLevel <= mslevelmax]
-
-        if rtmin:
-            spectra = [s for s in spectra if rtmin <= s.rt]
-        if rtmax:
-            spectra = [s for s in spectra if rtmax >= s.rt]
-
-        if mzmin is not None or mzmax is not None:
-            for s in spectra:
-                s.peaks = s.peaksInRange(mzmin, mzmax)
-
-        spectra = [s for s in spectra if len(s.peaks)]
+            keep &= levels <= mslevelmax
+
+        # only copy spectra which are kept, and only the peaks in the mz range:
+        restrict_mz = mzmin is not None or mzmax is not None
+        spectra = []
+        for i in ix[keep]:
+            spec = self.spectra[i]
+            imin, imax = 0, len(spec.peaks)
+            if restrict_mz:
+                imin, imax = _index_range(spec.peaks[:, 0], mzmin, mzmax)
+            if imin == imax:
+                continue
+            spec = spec._copyWithPeaks(spec.peaks[imin:imax].copy(order="F"))
+            if restrict_mz:
+                spec.meta.pop("unique_id", None)
+            spectra.append(spec)
 
-        return PeakMap(spectra, self.meta.copy())
+        meta = self.meta.copy()
+        meta.pop("unique_id", None)
+        return PeakMap(spectra, meta)
 
     def representingMzPeak(self, mzmin, mzmax, rtmin, rtmax):
         """returns a weighted mean m/z value in given range.
            high intensities contribute with weight ln(I+1) to final m/z value
         """
-        mzsum = wsum = 0
-        for s in self.spectra:
-            if rtmin <= s.rt <= rtmax:
-                ix = (mzmin <= s.peaks[:, 0]) * (s.peaks[:, 0] <= mzmax)
-                weights = np.log(s.peaks[ix, 1] + 1.0)
-                wsum += np.sum(weights)
-                mzsum += np.sum(s.peaks[ix, 0] * weights)
+        columns = self._columns()
+        ix = columns.indices_in_rt_range(rtmin, rtmax)
+        if not len(ix):
+            return None
+
+        # process peaks of all spectra in the range of the selected spectra at once:
+        i0, i1 = ix[0], ix[-1] + 1
+        lo, hi = columns.offsets[i0], columns.offsets[i1]
+        mzs = columns.mzs[lo:hi]
+        use = (mzmin <= mzs) & (mzs <= mzmax)
+        if len(ix) < i1 - i0:
+            # spectra in between which are not selected are masked out. this only
+            # happens if rt values were modified after sorting:
+            selected = np.zeros((i1 - i0,), dtype=bool)
+            selected[ix - i0] = True
+            use &= np.repeat(selected, np.diff(columns.offsets[i0:i1 + 1]))
+
+        weights = np.log1p(columns.intensities[lo:hi][use].astype(np.float64))
+        wsum = np.sum(weights)
         if wsum > 0.0:
-            return mzsum / wsum
+            return float(np.sum(mzs[use] * weights) / wsum)
         else:
             return None
 
@@ -306,7 +482,8 @@ class PeakMap(object):
         """
         returns list of spectra with rt values in range ``rtmin...rtmax``
         """
-        return [spec for spec in self.spectra if rtmin <= spec.rt <= rtmax]
+        ix = self._columns().indices_in_rt_range(rtmin, rtmax)
+        return [self.spectra[i] for i in ix.tolist()]
 
     def levelNSpecsInRange(self, n, rtmin, rtmax):
         """
@@ -315,9 +492,12 @@ class PeakMap(object):
         # rt values can be truncated/rounded from gui or other sources,
         # so wie dither the limits a bit, spaces in realistic rt values
         # are much higher thae 1e-2 seconds
-        return [spec for spec in self.spectra if rtmin - 1e-2 <= spec.rt
-                <= rtmax + 1e-2
-                and spec.msLevel == n]
+        return [self.spectra[i] for i in self._levelNIndicesInRange(n, rtmin, rtmax).tolist()]
+
+    def _levelNIndicesInRange(self, n, rtmin, rtmax):
+        columns = self._columns()
+        ix = columns.indices_in_rt_range(rtmin - 1e-2, rtmax + 1e-2)
+        return ix[columns.ms_levels[ix] == n]
 
     def remove(self, mzmin, mzmax, rtmin=None, rtmax=None, msLevel=None):
 
@@ -330,16 +510,32 @@ class PeakMap(object):
         if msLevel is None:
             msLevel = min(self.getMsLevels())
 
-        for s in self.spectra:
-            if s.msLevel != msLevel:
-                continue
-            if rtmin <= s.rt <= rtmax:
-                peaks = s.peaks
-                cut_out = (s.peaks[:, 0] >= mzmin) & (s.peaks[:, 0] <= mzmax)
-                s.peaks = peaks[~cut_out]
-
-        self.spectra = [s for s in self.spectra if len(s.peaks)]
-
+        columns = self._columns()
+        offsets = columns.offsets
+        # empty spectra are removed in any case:
+        has_empty = bool(np.any(offsets[:-1] == offsets[1:]))
+
+        ix = columns.indices_in_rt_range(rtmin, rtmax)
+        ix = ix[columns.ms_levels[ix] == msLevel]
+        if len(ix):
+            # mark peaks in mz range for all spectra in the range lo:hi of the flat peak
+            # arrays at once and count marked peaks per selected spectrum:
+            lo, hi = offsets[ix[0]], offsets[ix[-1] + 1]
+            mzs = columns.mzs[lo:hi]
+            cut_out = (mzs >= mzmin) & (mzs <= mzmax)
+            counts = np.zeros((hi - lo + 1,), dtype=np.int64)
+            np.cumsum(cut_out, out=counts[1:])
+            starts, ends = offsets[ix] - lo, offsets[ix + 1] - lo
+            n_cut = counts[ends] - counts[starts]
+            # only spectra which lose peaks are modified:
+            affected = n_cut > 0
+            has_empty = has_empty or bool(np.any(n_cut[affected] == (ends - starts)[affected]))
+            for i, start, end in zip(ix[affected], starts[affected], ends[affected]):
+                spec = self.spectra[i]
+                spec.peaks = np.asfortranarray(spec.peaks[~cut_out[start:end]])
+
+        if has_empty:
+            self.spectra = [s for s in self.spectra if len(s.peaks)]
 
     def chromatogram(self, mzmin, mzmax, rtmin=None, rtmax=None, msLevel=None):
         """
@@ -360,18 +556,48 @@ class PeakMap(object):
             msLevel = min(self.getMsLevels())
 
         if OPTIMIZATIONS_INSTALLED:
-            return emzed_optimizations.chromatogram(self, mzmin, mzmax, rtmin, rtmax, msLevel)
-
-        specs = self.levelNSpecsInRange(msLevel, rtmin, rtmax)
+            try:
+                return emzed_optimizations.chromatogram(self, mzmin, mzmax, rtmin, rtmax,
+                                                        msLevel)
+            except (TypeError, ValueError):
+                # emzed_optimizations >= 0.5 expects a tuple of spectra with float64
+                # peaks and rejects our peakmap before doing any work. the numpy
+                # implementation below is of comparable speed.
+                pass
+
+        ix = self._levelNIndicesInRange(msLevel, rtmin, rtmax)
+        if not len(ix):
+            return [], []
 
-        rts = [s.rt for s in specs]
-        intensities = [s.intensityInRange(mzmin, mzmax) for s in specs]
-        return rts, intensities
+        columns = self._columns()
+        starts = columns.offsets[ix]
+        ends = columns.offsets[ix + 1]
+
+        # the selected spectra are located in the range lo:hi of the flat peak arrays.
+        # we sum up the intensities of the peaks in the mz window for all spectra at
+        # once. weights has an extra trailing zero, so all bounds are valid indices for
+        # reduceat. weights keeps the dtype of the stored intensities to keep memory
+        # traffic low, summation is done in double precision:
+        lo, hi = starts[0], ends[-1]
+        in_window = _in_range(columns.mzs[lo:hi], mzmin, mzmax)
+        weights = np.zeros((hi - lo + 1,), dtype=columns.intensities.dtype)
+        weights[:-1][in_window] = columns.intensities[lo:hi][in_window]
+
+        bounds = np.empty((2 * len(ix),), dtype=np.int64)
+        bounds[0::2] = starts - lo
+        bounds[1::2] = ends - lo
+        intensities = np.add.reduceat(weights, bounds, dtype=np.float64)[0::2]
+        # reduceat returns weights[start] for empty ranges:
+        intensities[starts == ends] = 0.0
+
+        return columns.rts[ix].tolist(), intensities.tolist()
 
     def getMsLevels(self):
         """returns list of ms levels in current peak map"""
-
-        return sorted(set(spec.msLevel for spec in self.spectra))
+        columns = self._columns()
+        if "ms_levels" not in columns.derived:
+            columns.derived["ms_levels"] = np.unique(columns.ms_levels).tolist()
+        return list(columns.derived["ms_levels"])
 
     def msNPeaks(self, n, rtmin=None, rtmax=None):
         """return ms level n peaks in given range"""
@@ -379,28 +605,30 @@ class PeakMap(object):
             rtmin = self.spectra[0].rt
         if rtmax is None:
             rtmax = self.spectra[-1].rt
-        specs = self.levelNSpecsInRange(n, rtmin, rtmax)
-        # following vstack does not like empty sequence, so:
-        if len(specs):
-            peaks = np.vstack([s.peaks for s in specs])
-            perm = np.argsort(peaks[:, 0])
+        ix = self._levelNIndicesInRange(n, rtmin, rtmax)
+        if len(ix):
+            peaks = self._stackedPeaks(ix)
+            perm = np.argsort(peaks[:, 0], kind="mergesort")
             return peaks[perm, :]
         return np.zeros((0, 2), dtype=float)
 
     def allRts(self):
         """returns all rt values in peakmap"""
-        return [spec.rt for spec in self.spectra]
+        return self._columns().rts.tolist()
 
     def levelOneRts(self):
         """returns rt values of all level one spectra in peakmap"""
-        return [spec.rt for spec in self.spectra if spec.msLevel == 1]
+        columns = self._columns()
+        return columns.rts[columns.ms_levels == 1].tolist()
 
     def levelNSpecs(self, minN, maxN=None):
         """returns list of spectra in given msLevel range"""
 
         if maxN is None:
             maxN = minN
-        return [spec for spec in self.spectra if minN <= spec.msLevel <= maxN]
+        levels = self._columns().ms_levels
+        ix = np.flatnonzero((minN <= levels) & (levels <= maxN))
+        return [self.spectra[i] for i in ix]
 
     def shiftRt(self, delta):
         """shifts all rt values by delta"""
@@ -410,16 +638,25 @@ class PeakMap(object):
 
     def mzRange(self):
         """returns mz-range *(mzmin, mzmax)* of current peakmap """
-        mzranges = [s.mzRange() for s in self.spectra]
-        mzmin = min(mzmin for (mzmin, mzmax) in mzranges if mzmin is not None)
-        mzmax = max(mzmax for (mzmin, mzmax) in mzranges if mzmax is not None)
-        return (float(mzmin), float(mzmax))
+        columns = self._columns()
+        if "mz_range" not in columns.derived:
+            # peaks of each spectrum are sorted by mz, so we only look at the first and
+            # last peak of each non empty spectrum:
+            starts, ends = columns.offsets[:-1], columns.offsets[1:]
+            not_empty = starts < ends
+            mzmin = columns.mzs[starts[not_empty]].min()
+            mzmax = columns.mzs[ends[not_empty] - 1].max()
+            columns.derived["mz_range"] = (float(mzmin), float(mzmax))
+        return columns.derived["mz_range"]
 
     def rtRange(self):
         """ returns rt-range *(rtmin, tax)* of current peakmap """
-        rtmin = min(s.rt for s in self.spectra) if len(self.spectra) else 1e300
-        rtmax = max(s.rt for s in self.spectra) if len(self.spectra) else 1e300
-        return rtmin, rtmax
+        if not len(self.spectra):
+            return 1e300, 1e300
+        columns = self._columns()
+        if "rt_range" not in columns.derived:
+            columns.derived["rt_range"] = (float(columns.rts.min()), float(columns.rts.max()))
+        return columns.derived["rt_range"]
 
     @classmethod
     def fromMSExperiment(clz, mse):
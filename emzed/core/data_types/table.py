@@ -1,13 +1,16 @@
-import copy
+import csv
 import os
 import itertools
 import re
 import hashlib
+import gzip
 import cPickle
 import cStringIO
 import sys
+import types
 import inspect
-from collections import Counter, OrderedDict, defaultdict
+from collections import Counter, OrderedDict
+from operator import itemgetter
 import warnings
 
 import numpy as np
@@ -35,6 +38,20 @@ formatSeconds = fms
 formatHexId = "'%x' % id(o)"
 
 
+_type_name_pattern = re.compile("<(type|class) '((\w|[.])+)'>|(\w+)")
+
+_type_names_cache = dict()
+
+
+def _typeName(type_):
+    """ helper, returns the name of a column type as printed in table headers """
+    name = _type_names_cache.get(type_)
+    if name is None:
+        name = _type_name_pattern.match(str(type_)).groups()[1] or str(type_)
+        _type_names_cache[type_] = name
+    return name
+
+
 def guessFormatFor(name, type_):
     if type_ in (float, int):
         if name.startswith("m"):
@@ -54,24 +71,121 @@ def computekey(o):
     return id(o)
 
 
+_plain_key_types = frozenset((int, float, str, long, type(None)))
+
+_convertible_types = frozenset((int, float, long, str))
+
+
+def _is_groupable(column):
+    """ helper, checks if equal values in column array can be grouped with numpy
+        in the same way as splitBy groups keys. NaN values are not equal to
+        themselves and are left to the generic code path """
+    if column.dtype.kind in "iu":
+        return True
+    return column.dtype.kind == "f" and not np.isnan(column).any()
+
+
+def _groupFirstPositions(columns):
+    """ helper, returns labels of rows with equal values in all numerical
+        ``columns`` and the position of the first row for every label """
+    labels = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        values, inverse = np.unique(column, return_inverse=True)
+        # combine previous labels and values of current column to new dense labels:
+        __, labels = np.unique(labels * len(values) + inverse, return_inverse=True)
+    __, first, labels = np.unique(labels, return_index=True, return_inverse=True)
+    return labels, first
+
+
+def _groupPositions(columns):
+    """ helper, groups positions of rows with equal values in all numerical
+        ``columns``. returns one array of positions per group, groups are ordered
+        by their first row """
+    labels, first = _groupFirstPositions(columns)
+    if not len(first):
+        return []
+    group_ids = np.empty(len(first), dtype=np.int64)
+    group_ids[np.argsort(first)] = np.arange(len(first))
+    labels = group_ids[labels]
+    order = np.argsort(labels, kind="mergesort")
+    counts = np.bincount(labels, minlength=len(first))
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+_postfix_cache = dict()
+
+
 def getPostfix(colName):
-    if colName.startswith("__"):
-        return None
+    # the same few column names are resolved again and again during joins, so
+    # we remember results. the cache is bounded as names can be generated:
+    try:
+        return _postfix_cache[colName]
+    except KeyError:
+        pass
 
-    fields = colName.split("__")
+    if colName.startswith("__"):
+        postfix = None
+    else:
+        fields = colName.split("__")
+        if len(fields) > 2:
+            raise Exception("invalid colName %s" % colName)
+        if len(fields) == 1:
+            postfix = ""
+        else:
+            postfix = "__" + fields[1]
 
-    if len(fields) > 2:
-        raise Exception("invalid colName %s" % colName)
-    if len(fields) == 1:
-        return ""
-    return "__" + fields[1]
+    if len(_postfix_cache) >= 4096:
+        _postfix_cache.clear()
+    _postfix_cache[colName] = postfix
+    return postfix
 
 
 def convert_list_to_overall_type(li):
+    """ helper, returns the values of ``li`` converted to their common type and this
+        type """
     ct = common_type_for(li)
     if ct in (int, float, long, bool, str):
-        return [None if x is None else ct(x) for x in li]
-    return li
+        if not set(map(type, li)) <= set((ct, type(None))):
+            li = [None if x is None else ct(x) for x in li]
+    return li, ct
+
+
+_member_names_cache = dict()
+
+
+def _memberNames(clz):
+    """ helper, returns names of class members. inspecting the class instead of
+        the instance avoids calling properties and can be cached per class """
+    names = _member_names_cache.get(clz)
+    if names is None:
+        names = frozenset(name for name, obj in inspect.getmembers(clz))
+        _member_names_cache[clz] = names
+    return names
+
+
+_add_column_handlers = dict()
+
+
+def _addColumnHandler(what):
+    """ helper, returns the name of the Table method which adds a column from ``what``.
+        the checks only depend on the class of ``what`` and are done once per class,
+        except for old style class instances where callable() depends on the class """
+    clz = type(what)
+    handler = _add_column_handlers.get(clz)
+    if handler is None:
+        if isinstance(what, BaseExpression):
+            handler = "_addColumnByExpression"
+        elif callable(what):
+            handler = "_addColumnByCallback"
+        elif isinstance(what, (list, tuple, types.GeneratorType)):
+            handler = "_addColumFromIterable"
+        elif isinstance(what, np.ndarray):
+            handler = "_addColumnFromNdarray"
+        else:
+            handler = "_addConstantColumnWithoutNameCheck"
+        if clz is not types.InstanceType:
+            _add_column_handlers[clz] = handler
+    return handler
 
 
 class Bunch(dict):
@@ -97,18 +211,116 @@ class _CmdLineProgress(object):
         sys.stdout.flush()
 
 
+class _ColumnsOfTableFormat_2_0_3(object):
+
+    """ holds the rows of a table stored column wise, see ``Table._pickledColumns``.
+
+        emzed versions before 2.0.3 do not know this class, so they fail to load such
+        files with an error message naming the format instead of returning garbage.
+    """
+
+    def __init__(self, num_rows, columns):
+        self.num_rows = num_rows
+        self.columns = columns
+
+    def rows(self):
+        columns = [c.tolist() if isinstance(c, np.ndarray) else c for c in self.columns]
+        return _rowsFromColumns(columns, self.num_rows)
+
+
+# first characters of strings int() or float() may accept. includes leading white
+# space, "inf" and "nan" in all cases and decimal comma as in ",5":
+_numeric_start_chars = frozenset("+-.,0123456789iInN \t\n\r\x0b\x0c")
+
+
 def bestConvert(val):
     assert isinstance(val, str)
+    if val[:1] not in _numeric_start_chars:
+        # avoids raising and catching three exceptions for plain text
+        return str(val)
+    if "." not in val:
+        # int() never accepts a decimal point, so we save raising an exception for
+        # typical float values:
+        try:
+            return int(val)
+        except ValueError:
+            pass
     try:
-        return int(val)
+        return float(val)
     except ValueError:
         try:
-            return float(val)
+            return float(val.replace(",", "."))  # probs with comma
         except ValueError:
-            try:
-                return float(val.replace(",", "."))  # probs with comma
-            except ValueError:
-                return str(val)
+            return str(val)
+
+
+def _flaggedIndices(flags):
+    """ helper, returns the positions of the true values in ``flags`` """
+    if isinstance(flags, np.ndarray):
+        return np.flatnonzero(flags).tolist()
+    return list(itertools.compress(itertools.count(), flags))
+
+
+# types which can hold nan values:
+_nan_types = (float, complex, np.floating, np.complexfloating)
+
+
+def _columnWithoutNans(column, type_=None, mask=None):
+    """ helper, converts a one dimensional numpy array to a list of python values, nan
+        values are replaced by None. the replacement is done for the whole column, for
+        float columns without inspecting the single values.
+
+        ``mask`` may flag the missing values of an object array in advance.
+
+        if ``type_`` is int, float or str the values are converted to this type. """
+    kind = column.dtype.kind
+    if kind in "bi" and type_ in (int, float):
+        # there are no missing values, so numpy can convert all values at once:
+        return column.astype(type_).tolist()
+    if kind in "fc":
+        values = column.astype(object)
+        values[np.isnan(column)] = None
+        values = values.tolist()
+    elif kind == "O" and mask is not None:
+        values = column.copy()
+        values[mask] = None
+        values = values.tolist()
+    elif kind == "O":
+        # checking the type is much cheaper than catching the exceptions np.isnan raises
+        # for str and other values:
+        values = [None if isinstance(v, _nan_types) and v != v else v for v in column.tolist()]
+    else:
+        values = column.tolist()
+    if type_ in (int, float, str) and not (type_ is float and kind == "f"):
+        values = [None if v is None else type_(v) for v in values]
+    return values
+
+
+def _isHomogeneousColumn(values):
+    """ helper, checks if a column from ``Table._pickledColumns`` is a numpy array or a
+        non empty list of str values """
+    if isinstance(values, np.ndarray):
+        return True
+    return bool(values) and all(type(v) is str for v in values)
+
+
+def _rowsFromColumns(columns, num_rows):
+    """ helper, transposes a list of columns to a list of row lists """
+    if not columns:
+        return [[] for i in range(num_rows)]
+    return map(list, zip(*columns))
+
+
+def _insertColumn(rows, ix, values):
+    """ helper, inserts ``values`` at position ``ix`` into the rows **in place**.
+        map() runs the loop over the rows in C, which is about twice as fast as
+        a python for loop """
+    map(list.insert, rows, itertools.repeat(ix, len(rows)), values)
+
+
+def _removeColumn(rows, ix):
+    """ helper, removes value at position ``ix`` from the rows **in place** """
+    map(list.pop, rows, itertools.repeat(ix, len(rows)))
 
 
 def _formatter(f):
@@ -150,14 +362,15 @@ class Table(object):
 
     """
 
-    _latest_internal_update_with_version = (2, 0, 2)
+    _latest_internal_update_with_version = (2, 0, 3)
 
+    # the rows are pickled after these attributes. since 2.0.3 they are not pickled
+    # as they are but column wise, see _ColumnsOfTableFormat_2_0_3:
     _to_pickle = ("_colNames",
                   "_colTypes",
                   "_colFormats",
                   "title",
-                  "meta",
-                  "rows")
+                  "meta")
 
     def __init__(self, colNames, colTypes, colFormats, rows=None, title=None,
                  meta=None):
@@ -207,7 +420,7 @@ class Table(object):
 
         self.rows = rows
         self.title = title
-        self.meta = copy.copy(meta) if meta is not None else dict()
+        self.meta = dict() if meta is None else meta.copy()
 
         self.primaryIndex = {}
         self._name = repr(self)
@@ -218,10 +431,7 @@ class Table(object):
         # not be in objects __dict__ and must not be name of member
         # functions:
 
-        warnings.simplefilter("ignore", UserWarning)
-        memberNames = [name for name, obj in inspect.getmembers(self)]
-        warnings.simplefilter("always", UserWarning)
-
+        memberNames = _memberNames(type(self))
         for name in colNames:
             if name in self.__dict__ or name in memberNames:
                 raise Exception("colName '%s' not allowed" % name)
@@ -292,15 +502,18 @@ class Table(object):
         for i, (name, type_, format_) in enumerate(zip(self._colNames,
                                                        self._colTypes,
                                                        self._colFormats)):
-            vals = getattr(self, name).values
-            nones = sum(1 for v in vals if v is None)
-            numvals = len(set(id(v) for v in vals))
-            txt = "%3d diff vals, %3d Nones" % (numvals, nones)
-            match = re.match("<(type|class) '(.+)'>", str(type_))
-            if match is not None:
-                type_str = match.group(2).split(".")[-1]
+            vals = self._currentColumnArray(i)
+            if vals.dtype == object:
+                nones = sum(1 for v in vals if v is None)
+                numvals = len(set(id(v) for v in vals))
             else:
-                type_str = str(type_)
+                # numerical column without Nones
+                nones = 0
+                numvals = len(np.unique(vals))
+            txt = "%3d diff vals, %3d Nones" % (numvals, nones)
+            # str(type_) is "<type 'xyz'>" or "<class 'abc.xyz'>", and the last part
+            # of the dotted name is __name__:
+            type_str = type_.__name__ if isinstance(type_, type) else str(type_)
             print "   column %2d:  %-25s in column %-15s of type %-10s with format %r" % (i, txt, name, type_str, format_)
         print
 
@@ -310,14 +523,15 @@ class Table(object):
 
             Raises an ``AssertException`` if the length of ``row`` does not
             match to the numbers of columns of the table.
+
+            If you add many rows you can use ``doResetInternals=False`` and call
+            :py:meth:`~.resetInternals` after adding the last row.
             """
-        try:
-            self.rows.append([])
-            # includes checks which might throw exceptions:
-            self.setRow(len(self) - 1, row)
-        except:
-            self.rows.pop()
-            raise
+        # includes checks which might throw exceptions:
+        self._convertRow(row)
+        self.rows.append(row)
+        if doResetInternals:
+            self._resetRowCaches()
 
     def isEditable(self, colName):
         return colName in self.editableColumns
@@ -349,13 +563,21 @@ class Table(object):
 
             See: :py:class:`~emzed.core.data_types.expressions.ColumnExpression`
         """
-        return getattr(self, name)
+        try:
+            return self._columnExpressions[name]
+        except KeyError:
+            raise AttributeError("table has no column %r" % name)
 
     def _setupColumnAttributes(self):
-        for name in self._colNames:
-            ix = self.getIndex(name)
-            col = ColumnExpression(self, name, ix, self._colTypes[ix])
-            setattr(self, name, col)
+        # remove attributes of renamed or dropped columns:
+        for name, col in self.__dict__.get("_columnExpressions", {}).items():
+            if self.__dict__.get(name) is col:
+                del self.__dict__[name]
+        columns = dict()
+        for ix, (name, type_) in enumerate(zip(self._colNames, self._colTypes)):
+            columns[name] = ColumnExpression(self, name, ix, type_)
+        self._columnExpressions = columns
+        self.__dict__.update(columns)
 
     def numRows(self):
         """
@@ -382,9 +604,8 @@ class Table(object):
         if not isinstance(ix, slice):
             ix = slice(ix, ix + 1)
         prototype = self.buildEmptyClone()
-        for row in self.rows[ix]:
-            prototype.rows.append(row[:])
-        prototype.resetInternals()
+        prototype.rows = [row[:] for row in self.rows[ix]]
+        prototype._resetRowCaches()
         return prototype
 
     def __getstate__(self):
@@ -392,8 +613,11 @@ class Table(object):
         dd = self.__dict__.copy()
         # self.colFormatters can not be pickled
         del dd["colFormatters"]
-        for name in self._colNames:
-            del dd[name]
+        for name in dd.pop("_columnExpressions", ()):
+            dd.pop(name, None)
+        dd.pop("_rowPositions", None)
+        dd.pop("_postfixes", None)
+        dd.pop("_columnCache", None)
         return dd
 
     def __setstate__(self, dd):
@@ -479,12 +703,28 @@ class Table(object):
             Example: ``table.setValue(table.rows[0], "mz", 252.83332)``
         """
         if slow_but_checked:
-            assert id(row) in map(id, self.rows)
+            assert self._containsRow(row)
         ix = self.getIndex(colName)
         if type(value) in [np.float32, np.float64]:
             value = float(value)
         row[ix] = value
-        self.resetInternals()
+        self._resetRowCaches()
+
+    def _containsRow(self, row):
+        """ **internal method**
+
+            checks if ``row`` is one of the row objects in ``self.rows``. the
+            positions of the rows are cached and only recomputed if the cached
+            position of ``row`` is outdated.
+        """
+        positions = self.__dict__.get("_rowPositions")
+        if positions is not None:
+            ix = positions.get(id(row))
+            if ix is not None and ix < len(self.rows) and self.rows[ix] is row:
+                return True
+        positions = dict((id(r), i) for i, r in enumerate(self.rows))
+        self._rowPositions = positions
+        return id(row) in positions
 
     def __iter__(self):
         for row in self.rows:
@@ -501,38 +741,95 @@ class Table(object):
                 print row["mz"]
                 print row.mz
         """
-        return Bunch((n, self.getValue(row, n)) for n in self._colNames)
+        return Bunch(zip(self._colNames, row))
 
     def getValue(self, row, colName, default=None):
         """ returns value of column ``colName`` in a given ``row``
 
             Example: ``table.getValue(table.rows[0], "mz")``
         """
-        if colName not in self._colNames:
+        ix = self.colIndizes.get(colName)
+        if ix is None:
             return default
-        return row[self.getIndex(colName)]
+        return row[ix]
 
     def setRow(self, idx, row):
         """ replaces row ``idx`` with ``row``.
             be carefull we only check the length not the types !
         """
         assert 0 <= idx < len(self)
+        self._convertRow(row)
+        self.rows[idx] = row
+        self._resetRowCaches()
+
+    def _convertRow(self, row):
+        # other sequences would break methods which modify rows in place:
+        if not isinstance(row, list):
+            raise TypeError("row must be a list, got %s" % type(row).__name__)
         assert len(row) == len(self._colNames), "row as wrong length %d" % len(row)
 
         # check for conversion !
-        for i, (v, t) in enumerate(zip(row, self._colTypes)):
-            if v is not None and t in [int, float, long, str]:
-                row[i] = t(v)
-            else:
-                row[i] = v
-        self.rows[idx] = row
-        self.resetInternals()
+        for i, t in enumerate(self._colTypes):
+            if t in _convertible_types:
+                v = row[i]
+                if v is not None and type(v) is not t:
+                    row[i] = t(v)
+
+    def _columnValues(self, ix):
+        """ **internal method**
+            returns the values of column ``ix`` as a tuple. the result is cached
+            until :py:meth:`~.resetInternals` or :py:meth:`~._resetRowCaches` is
+            called.
+        """
+        cache = self.__dict__.setdefault("_columnCache", dict())
+        entry = cache.get(ix)
+        if entry is None:
+            entry = cache[ix] = [tuple(row[ix] for row in self.rows), None]
+        return entry[0]
+
+    def _columnArray(self, ix):
+        """ **internal method**
+            returns the values of column ``ix`` as a numpy array. columns of
+            numerical types get the dtype numpy derives from their values, all
+            other columns have dtype object.
+            the array is built from :py:meth:`~._columnValues` and cached the same
+            way, so do not modify the result in place.
+        """
+        values = self._columnValues(ix)
+        entry = self._columnCache[ix]
+        if entry[1] is None:
+            entry[1] = self._valuesToArray(values, self._colTypes[ix])
+        return entry[1]
+
+    def _currentColumnArray(self, ix):
+        """ **internal method**
+            as :py:meth:`~._columnArray`, but built from the current rows without
+            using the cache, as ``self.rows`` is public and may be modified in
+            place.
+        """
+        return self._valuesToArray([row[ix] for row in self.rows], self._colTypes[ix])
+
+    @staticmethod
+    def _valuesToArray(values, type_):
+        if type_ in _basic_num_types:
+            column = np.array(values)
+            if column.ndim == 1:
+                return column
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
 
     def _getColumnCtx(self, needed):
         names = [n for (t, n) in needed if t == self]
-        return dict((n, (self.getColumn(n).values,
-                         self.primaryIndex.get(n),
-                         self.getColumn(n).type_)) for n in names)
+        ctx = dict()
+        for n in names:
+            col = self.getColumn(n)
+            if col.type_ in _basic_num_types:
+                values = self._columnArray(col.idx)
+            else:
+                values = col.values
+            ctx[n] = (values, self.primaryIndex.get(n), col.type_)
+        return ctx
 
     def addEnumeration(self, colName="id"):
         """ adds enumerated column as first column to table **in place**.
@@ -546,20 +843,8 @@ class Table(object):
             raise Exception("column with name %r already exists" % colName)
         self._colNames.insert(0, colName)
         self._colTypes.insert(0, int)
-        if len(self) > 99999:
-            fmt = "%6d"
-        elif len(self) > 9999:
-            fmt = "%5d"
-        elif len(self) > 999:
-            fmt = "%4d"
-        elif len(self) > 99:
-            fmt = "%3d"
-        elif len(self) > 9:
-            fmt = "%2d"
-        else:
-            fmt = "%d"
-        fmt = "%d"
-        self._colFormats.insert(0, fmt)
+        self._colFormats.insert(0, "%d")
+        # we modify the rows in place, as callers may hold references to them:
         for i, r in enumerate(self.rows):
             r.insert(0, i)
         self.resetInternals()
@@ -580,10 +865,21 @@ class Table(object):
             colNames = [colNames]
 
         idxs = [self.colIndizes[name] for name in colNames]
+        columns = [self._currentColumnArray(idx) for idx in idxs]
+
+        if columns and all(column.dtype.kind in "biuf" for column in columns):
+            # numerical columns without None values: np.lexsort is stable and
+            # uses the last key as primary key. other dtypes, e.g. strings numpy
+            # derived from mixed values, would not sort as python does.
+            permutation = np.lexsort(columns[::-1]).tolist()
+        else:
+            decorated = [([row[idx] for idx in idxs], i) for (i, row) in enumerate(self.rows)]
+            decorated.sort()
+            permutation = [i for (_, i) in decorated]
 
-        decorated = [([row[idx] for idx in idxs], i) for (i, row) in enumerate(self.rows)]
-        decorated.sort(reverse=not ascending)
-        permutation = [i for (_, i) in decorated]
+        if not ascending:
+            # same as sorting (keys, i) tuples with reverse=True:
+            permutation.reverse()
 
         self._applyRowPermutation(permutation)
 
@@ -594,8 +890,8 @@ class Table(object):
         return permutation
 
     def _applyRowPermutation(self, permutation):
-        self.rows = [self.rows[permutation[i]] for i in range(len(permutation))]
-        self.resetInternals()
+        self.rows = [self.rows[i] for i in permutation]
+        self._resetRowCaches()
 
     def copy(self):
         """ returns a 'semi-deep' copy of the table """
@@ -612,8 +908,16 @@ class Table(object):
         indices = [self.getIndex(name) for name in names]
         types = [self._colTypes[i] for i in indices]
         formats = [self._colFormats[i] for i in indices]
-        rows = [[row[i] for i in indices] for row in self.rows]
-        return Table._create(names, types, formats, rows, self.title, self.meta.copy())
+        if len(indices) > 1:
+            get = itemgetter(*indices)
+            rows = [list(get(row)) for row in self.rows]
+        elif indices:
+            i, = indices
+            rows = [[row[i]] for row in self.rows]
+        else:
+            rows = [[] for row in self.rows]
+        # _create copies meta:
+        return Table._create(names, types, formats, rows, self.title, self.meta)
 
     def _renameColumnsUnchecked(self, *dicts, **keyword_args):
         for d in dicts:
@@ -703,18 +1007,23 @@ class Table(object):
                         colNames = self.getVisibleCols()
                     else:
                         colNames = self._colNames
-                    print >> fp, "; ".join(colNames)
-                    for row in self.rows:
-                        data = [self.getValue(row, v) for v in colNames]
-                        print >> fp, "; ".join(map(str, data))
+                    # values are converted with str() as before, as the csv module
+                    # writes None as empty field and floats with full precision:
+                    writer = csv.writer(fp, delimiter=";", lineterminator="\n")
+                    writer.writerow(colNames)
+                    idxs = [self.getIndex(n) for n in colNames]
+                    writer.writerows([str(row[i]) for i in idxs] for row in self.rows)
                 break
 
-    def store(self, path, forceOverwrite=False, compressed=True):
+    def store(self, path, forceOverwrite=False, compressed=True, gzipped=False):
         """
         writes the table in binary format. All information, as
         corresponding peak maps ar too.
         The file name extension must be ".table".
 
+        If ``gzipped`` is *True* the pickled data is gzip compressed. Such files
+        can not be read by emzed versions which do not support this yet.
+
         Latter the file can be loaded with :py:meth:`~.load`
         """
         if not forceOverwrite and os.path.exists(path):
@@ -724,36 +1033,76 @@ class Table(object):
         with open(path, "w+b") as fp:
             fp.write("emzed_version=%s.%s.%s\n" % self._latest_internal_update_with_version)
             data = tuple(getattr(self, a) for a in Table._to_pickle)
-            cPickle.dump(data, fp, protocol=2)
+            data += (_ColumnsOfTableFormat_2_0_3(len(self.rows), self._pickledColumns()),)
+            if gzipped:
+                with gzip.GzipFile(fileobj=fp, mode="wb", compresslevel=1) as stream:
+                    cPickle.dump(data, stream, protocol=2)
+            else:
+                cPickle.dump(data, fp, protocol=2)
+
+    def _pickledColumns(self):
+        """ **internal method**
+
+            returns the columns of the table for pickling. columns which only hold
+            python ints or only python floats are converted to numpy arrays, which
+            pickle as one binary string. all other columns are lists.
+        """
+        columns = []
+        for i in range(len(self._colNames)):
+            values = [row[i] for row in self.rows]
+            types = set(map(type, values))
+            if types == set((float,)):
+                columns.append(np.array(values, dtype=np.float64))
+            elif types == set((int,)):
+                columns.append(np.array(values, dtype=np.int64))
+            else:
+                columns.append(values)
+        return columns
 
     @staticmethod
-    def _load_strict(pickle_data):
+    def _load_strict(fp, version):
         try:
-            data = cPickle.loads(pickle_data)
+            data = cPickle.load(fp)
         except Exception, e:
             raise Exception("file has invalid format: %s" % e)
 
         if not isinstance(data, (list, tuple)):
             raise Exception("data item from file is not list or tuple")
-        if len(data) != len(Table._to_pickle):
+
+        n = len(Table._to_pickle)
+        if len(data) != n + 1:
             raise Exception("number of data items from file does not match Table._to_pickle")
+        rows = data[n]
+        if version >= (2, 0, 3):
+            if not isinstance(rows, _ColumnsOfTableFormat_2_0_3):
+                raise Exception("file has invalid format: no columns found")
+            rows = rows.rows()
+
         tab = Table([], [], [], [], None, None)
         for name, item in zip(Table._to_pickle, data):
             setattr(tab, name, item)
+        tab.rows = rows
+        tab.resetInternals()
         return tab
 
     @staticmethod
     def _try_to_load_old_version(pickle_data):
-        import sys
         from . import table, ms_types
-        sys.modules["libms.DataStructures.Table"] = table
-        sys.modules["libms.DataStructures.MSTypes"] = ms_types
-        try:
-            tab = cPickle.loads(pickle_data)
-        finally:
-            del sys.modules["libms.DataStructures.Table"]
-            del sys.modules["libms.DataStructures.MSTypes"]
-        return tab
+        # classes from older emzed versions are resolved by the unpickler, so we
+        # do not have to register the old module names in sys.modules:
+        old_modules = {"libms.DataStructures.Table": table,
+                       "libms.DataStructures.MSTypes": ms_types}
+
+        def find_global(module_name, name):
+            module = old_modules.get(module_name)
+            if module is None:
+                __import__(module_name)
+                module = sys.modules[module_name]
+            return getattr(module, name)
+
+        unpickler = cPickle.Unpickler(cStringIO.StringIO(pickle_data))
+        unpickler.find_global = find_global
+        return unpickler.load()
 
     @staticmethod
     def load(path):
@@ -763,28 +1112,42 @@ class Table(object):
            ``tab = Table.load("xzy.table")``
         """
         with open(path, "rb") as fp:
-            data = fp.read()
-            version_str, __, pickle_data = data.partition("\n")
+            first_line = fp.readline()
+            version_str, __, __ = first_line.partition("\n")
             if not version_str.startswith("emzed_version="):
+                pickle_data = fp.read()
                 try:
                     return Table._try_to_load_old_version(pickle_data)
                 except:
-                    return Table._try_to_load_old_version(data)
+                    return Table._try_to_load_old_version(first_line + pickle_data)
             v_number_str = version_str[14:]
             v_number = tuple(map(int, v_number_str.split(".")))
+            # we unpickle from the file instead of reading it into memory first,
+            # gzip compressed pickles are recognized by their magic bytes:
+            start = fp.tell()
+            is_gzipped = fp.read(2) == "\x1f\x8b"
+            fp.seek(start)
             try:
-                tab = Table._load_strict(pickle_data)
+                if is_gzipped:
+                    with gzip.GzipFile(fileobj=fp, mode="rb") as stream:
+                        tab = Table._load_strict(stream, v_number)
+                else:
+                    tab = Table._load_strict(fp, v_number)
                 tab.version = v_number
                 tab.meta["loaded_from"] = os.path.abspath(path)
                 return tab
             except:
+                fp.seek(start)
+                pickle_data = fp.read()
+                if is_gzipped:
+                    pickle_data = gzip.GzipFile(fileobj=cStringIO.StringIO(pickle_data)).read()
                 return Table._try_to_load_old_version(pickle_data)
 
     def buildEmptyClone(self):
         """ returns empty table with same names, types, formatters,
             title and meta data """
         return Table._create(self._colNames, self._colTypes, self._colFormats,
-                             [], self.title, self.meta.copy())
+                             [], self.title, self.meta)
 
     def dropColumns(self, *names):
         """ removes columns with given ``names`` from the table.
@@ -795,8 +1158,6 @@ class Table(object):
         # check all names before manipulating the table,
         # so this operation is atomic
         self.ensureColNames(*names)
-        for name in names:
-            delattr(self, name)
 
         indices = [self.getIndex(n) for n in names]
         indices.sort()
@@ -804,8 +1165,7 @@ class Table(object):
             del self._colNames[ix]
             del self._colFormats[ix]
             del self._colTypes[ix]
-            for row in self.rows:
-                del row[ix]
+            _removeColumn(self.rows, ix)
         if len(self._colNames) == 0:
             # in this case we have here len(table) empty lists as rows, so we empty the tabl
             # totally:
@@ -856,22 +1216,31 @@ class Table(object):
 
         """
         self.ensureColNames(colNames)
-
-        groups = set()
-        for row in self.rows:
-            key = computekey([self.getValue(row, n) for n in colNames])
-            groups.add(key)
+        idxs = [self.getIndex(n) for n in colNames]
+
+        columns = [self._currentColumnArray(idx) for idx in idxs]
+        if columns and all(_is_groupable(column) for column in columns):
+            splitedTables = []
+            for positions in _groupPositions(columns):
+                table = self.buildEmptyClone()
+                table.rows = [self.rows[i][:] for i in positions.tolist()]
+                table._resetRowCaches()
+                splitedTables.append(table)
+            return splitedTables
 
         # preserve order of rows
         subTables = OrderedDict()
         for row in self.rows:
-            key = computekey([self.getValue(row, n) for n in colNames])
+            key = tuple(row[i] for i in idxs)
+            # computekey(key) == key for these types, so we can skip it:
+            if not all(type(v) in _plain_key_types for v in key):
+                key = computekey(key)
             if key not in subTables:
                 subTables[key] = self.buildEmptyClone()
             subTables[key].rows.append(row[:])
         splitedTables = subTables.values()
         for table in splitedTables:
-            table.resetInternals()
+            table._resetRowCaches()
         return splitedTables
 
     def append(self, *tables):
@@ -894,16 +1263,17 @@ class Table(object):
             else:
                 raise Exception("can not join object %r" % table)
 
-        names = set((tuple(t._colNames)) for t in alltables)
-        if len(names) > 1:
-            raise Exception("the column names do not match")
-
-        types = set((tuple(t._colTypes)) for t in alltables)
-        if len(types) > 1:
-            raise Exception("the column types do not match")
-        for t in alltables:
-            self.rows.extend(t.rows)
-        self.resetInternals()
+        if alltables:
+            names = alltables[0]._colNames
+            types = alltables[0]._colTypes
+            if any(t._colNames != names for t in alltables):
+                raise Exception("the column names do not match")
+            if any(t._colTypes != types for t in alltables):
+                raise Exception("the column types do not match")
+        # we collect the rows first, as self may be in alltables too, then
+        # extending self.rows from an iterator over self.rows would not stop:
+        self.rows.extend(list(itertools.chain.from_iterable(t.rows for t in alltables)))
+        self._resetRowCaches()
 
     def replaceColumn(self, name, what, type_=None, format_=""):
         """
@@ -977,8 +1347,6 @@ class Table(object):
 
     def _addColumnWithoutNameCheck(self, name, what, type_=None, format_="",
                                    insertBefore=None, insertAfter=None):
-        import types
-
         assert isinstance(name, (str, unicode)), "colum name is not a  string"
 
         if type_ is not None:
@@ -987,25 +1355,8 @@ class Table(object):
         if name in self._colNames:
             raise Exception("column with name %r already exists" % name)
 
-        if isinstance(what, BaseExpression):
-            return self._addColumnByExpression(name, what, type_, format_,
-                                               insertBefore, insertAfter)
-        if callable(what):
-            return self._addColumnByCallback(name, what, type_, format_,
-                                             insertBefore, insertAfter)
-
-        if isinstance(what, (list, tuple, types.GeneratorType)):
-            return self._addColumFromIterable(name, what, type_, format_,
-                                              insertBefore, insertAfter)
-        if isinstance(what, np.ndarray):
-            if what.ndim == 1:
-                return self._addColumFromIterable(name, what, type_, format_,
-                                                  insertBefore, insertAfter)
-            else:
-                warnings.warn("you added %d numpy array as colum", what.ndim)
-
-        return self._addConstantColumnWithoutNameCheck(name, what, type_,
-                                                       format_, insertBefore, insertAfter)
+        handler = getattr(self, _addColumnHandler(what))
+        return handler(name, what, type_, format_, insertBefore, insertAfter)
 
     def _addColumnByExpression(self, name, expr, type_, format_, insertBefore, insertAfter):
         values, _, type2_ = expr._eval(None)
@@ -1016,13 +1367,23 @@ class Table(object):
         return self._addColumn(name, values, type_ or type2_, format_, insertBefore, insertAfter)
 
     def _addColumnByCallback(self, name, callback, type_, format_, insertBefore, insertAfter):
-        values = [callback(self, r, name) for r in self.rows]
+        n = len(self.rows)
+        # map with repeated arguments loops in C instead of a python level comprehension
+        values = map(callback, itertools.repeat(self, n), self.rows, itertools.repeat(name, n))
         return self._addColumn(name, values, type_, format_, insertBefore, insertAfter)
 
     def _addColumFromIterable(self, name, iterable, type_, format_, insertBefore, insertAfter):
         values = list(iterable)
         return self._addColumn(name, values, type_, format_, insertBefore, insertAfter)
 
+    def _addColumnFromNdarray(self, name, values, type_, format_, insertBefore, insertAfter):
+        if values.ndim == 1:
+            return self._addColumFromIterable(name, values, type_, format_,
+                                              insertBefore, insertAfter)
+        warnings.warn("you added %d numpy array as colum", values.ndim)
+        return self._addConstantColumnWithoutNameCheck(name, values, type_, format_,
+                                                       insertBefore, insertAfter)
+
     def _addColumn(self, name, values, type_, format_, insertBefore, insertAfter):
         # works for lists, numbers, objects: converts inner numpy dtypes
         # to python types if present, else does nothing !!!!
@@ -1060,8 +1421,7 @@ class Table(object):
                 self._colNames.insert(insertBefore, name)
                 self._colTypes.insert(insertBefore, type_)
                 self._colFormats.insert(insertBefore, format_)
-                for row, v in zip(self.rows, values):
-                    row.insert(insertBefore, v)
+                _insertColumn(self.rows, insertBefore, values)
 
             else:
                 raise Exception("can not handle insertBefore=%r" % insertBefore)
@@ -1080,12 +1440,7 @@ class Table(object):
                 self._colNames.insert(insertAfter + 1, name)
                 self._colTypes.insert(insertAfter + 1, type_)
                 self._colFormats.insert(insertAfter + 1, format_)
-                if insertAfter == len(self._colNames) - 1:
-                    for row, v in zip(self.rows, values):
-                        row.append(v)
-                else:
-                    for row, v in zip(self.rows, values):
-                        row.insert(insertAfter + 1, v)
+                _insertColumn(self.rows, insertAfter + 1, values)
 
             else:
                 raise Exception("can not handle insertAfter=%r" % insertAfter)
@@ -1113,6 +1468,9 @@ class Table(object):
             assert isinstance(type_, type), "type_ param is not a type"
         if name in self._colNames:
             raise Exception("column with name '%s' already exists" % name)
+        if type_ is None and len(self):
+            # saves _addColumn to inspect every single value of the column:
+            type_ = common_type_for([value])
         return self._addColumn(name, [value] * len(self), type_, format_,
                                insertBefore, insertAfter)
 
@@ -1131,6 +1489,18 @@ class Table(object):
         self._setupFormatters()
         self._updateIndices()
         self._setupColumnAttributes()
+        self.__dict__.pop("_postfixes", None)
+        self._columnCache = dict()
+
+    def _resetRowCaches(self):
+        """  **internal method**
+
+            cheaper variant of :py:meth:`~.resetInternals` if only ``self.rows``
+            changed but not the names, types or formats of the columns.
+        """
+        self._columnCache = dict()
+        for col in self._columnExpressions.values():
+            col._resetValues()
 
     def uniqueRows(self):
         """
@@ -1139,9 +1509,19 @@ class Table(object):
         columns (those with ``format_==None``) are equal.
         """
         result = self.buildEmptyClone()
+
+        columns = [self._currentColumnArray(i) for i in range(len(self._colNames))]
+        if columns and all(_is_groupable(column) for column in columns):
+            __, first = _groupFirstPositions(columns)
+            result.rows = [self.rows[i][:] for i in np.sort(first).tolist()]
+            return result
+
         keysSeen = set()
         for row in self.rows:
-            key = computekey(row)
+            key = tuple(row)
+            # computekey(key) == key for these types, so we can skip it:
+            if not all(type(v) in _plain_key_types for v in key):
+                key = computekey(key)
             if key not in keysSeen:
                 result.rows.append(row[:])
                 keysSeen.add(key)
@@ -1172,7 +1552,7 @@ class Table(object):
                 filteredTable.rows = []
         else:
             assert len(flags) == len(self), "result of filter expression does not match table size"
-            filteredTable.rows = [self.rows[n][:] for n, i in enumerate(flags) if i]
+            filteredTable.rows = [r[:] for r in itertools.compress(self.rows, flags)]
         return filteredTable
 
     def removePostfixes(self, *postfixes):
@@ -1187,13 +1567,12 @@ class Table(object):
         for column_name in self._colNames:
             if not postfixes:
                 new_column_name, __, __ = column_name.partition("__")
+            elif column_name.endswith(postfixes):
+                # the first matching postfix in the given order wins:
+                pf = next(pf for pf in postfixes if column_name.endswith(pf))
+                new_column_name = column_name[:-len(pf)]
             else:
-                for pf in postfixes:
-                    if column_name.endswith(pf):
-                        new_column_name = column_name[:-len(pf)]
-                        break
-                else:
-                    new_column_name = column_name
+                new_column_name = column_name
             new_column_names.append(new_column_name)
 
         if len(set(new_column_names)) != len(new_column_names):
@@ -1216,21 +1595,12 @@ class Table(object):
 
         """
 
-        collected = defaultdict(list)
-        for name in self._colNames:
-            for prefix in colNamesToSupport:
-                if name.startswith(prefix):
-                    collected[prefix].append(name[len(prefix):])
+        prefixes = [(prefix, len(prefix)) for prefix in colNamesToSupport]
+        counter = Counter(name[n:] for name in self._colNames
+                          for (prefix, n) in prefixes if name.startswith(prefix))
 
-        counter = defaultdict(int)
-        for postfixes in collected.values():
-            for postfix in postfixes:
-                counter[postfix] += 1
-
-        supported = [pf for pf, count in counter.items()
-                     if count == len(colNamesToSupport)]
-
-        return sorted(set(supported))
+        num_prefixes = len(colNamesToSupport)
+        return sorted(pf for pf, count in counter.items() if count == num_prefixes)
 
     def join(self, t, expr=True, debug=False, title=None):
         """joins two tables.
@@ -1283,23 +1653,7 @@ class Table(object):
 
         if debug:
             print "# %s.join(%s, %s)" % (self._name, t._name, expr)
-        tctx = t._getColumnCtx(expr._neededColumns())
-
-        cmdlineProgress = _CmdLineProgress(len(self))
-        rows = []
-        for ii, r1 in enumerate(self.rows):
-            r1ctx = dict(
-                (n, ([v], None, t)) for (n, v, t) in zip(self._colNames, r1, self._colTypes))
-            ctx = {self: r1ctx, t: tctx}
-            flags, _, _ = expr._eval(ctx)
-            if len(flags) == 1:
-                if flags[0]:
-                    rows.extend([r1[:] + row[:] for row in t.rows])
-            else:
-                rows.extend([r1[:] + t.rows[n][:] for (n, i) in enumerate(flags) if i])
-            cmdlineProgress.progress(ii)
-        cmdlineProgress.finish()
-        table.rows = rows
+        table.rows = self._joinRows(t, expr)
         return table
 
     def leftJoin(self, t, expr=True, debug=False, title=None):
@@ -1338,41 +1692,68 @@ class Table(object):
 
         if debug:
             print "# %s.leftJoin(%s, %s)" % (self._name, t._name, expr)
-        tctx = t._getColumnCtx(expr._neededColumns())
+        table.rows = self._joinRows(t, expr, filler=[None] * len(t._colNames))
+        return table
 
-        filler = [None] * len(t._colNames)
-        cmdlineProgress = _CmdLineProgress(len(self))
+    def _joinRows(self, t, expr, filler=None):
+        """ **internal method**
 
-        rows = []
+            evaluates ``expr`` for every row of the table against all rows of ``t``
+            and returns the concatenated rows of all matching pairs.
+
+            if ``filler`` is not *None*, rows without match are concatenated with
+            ``filler``, as needed for :py:meth:`~.leftJoin`
+        """
+        needed = expr._neededColumns()
+        tctx = t._getColumnCtx(needed)
+        all_rows = range(len(t))
+
+        # the context for the current row is built once, per row we only update the
+        # values of the columns which appear in expr:
+        indices = [self.getIndex(n) for (tab, n) in needed if tab == self]
+        slots = [[None] for i in indices]
+        r1ctx = dict((self._colNames[i], (slot, None, self._colTypes[i]))
+                     for (i, slot) in zip(indices, slots))
+        ctx = {self: r1ctx, t: tctx}
+
+        # first we collect the matching rows of t for every row, the joined rows are
+        # assembled afterwards in one go:
+        cmdlineProgress = _CmdLineProgress(len(self))
+        matches = []
         for ii, r1 in enumerate(self.rows):
-            r1ctx = dict(
-                (n, ([v], None, t)) for (n, v, t) in zip(self._colNames, r1, self._colTypes))
-            ctx = {self: r1ctx, t: tctx}
+            for slot, i in zip(slots, indices):
+                slot[0] = r1[i]
             flags, _, _ = expr._eval(ctx)
             if len(flags) == 1:
-                if flags[0]:
-                    rows.extend([r1[:] + row[:] for row in t.rows])
-                else:
-                    rows.extend([r1[:] + filler[:]])
-            elif np.any(flags):
-                rows.extend([r1[:] + t.rows[n][:] for (n, i) in enumerate(flags) if i])
+                matches.append(all_rows if flags[0] else None)
             else:
-                rows.extend([r1[:] + filler[:]])
+                matches.append(_flaggedIndices(flags) or None)
             cmdlineProgress.progress(ii)
-
         cmdlineProgress.finish()
 
-        table.rows = rows
-        return table
+        rows = []
+        t_rows = t.rows
+        for r1, match in zip(self.rows, matches):
+            # concatenation creates a new list, so there is no need to copy r1 or
+            # the rows of t before:
+            if match is not None:
+                rows.extend([r1 + t_rows[n] for n in match])
+            elif filler is not None:
+                rows.append(r1 + filler)
+        return rows
 
     def _postfixValues(self):
         ""  # no autodoc ?
 
         """ finds postfixes 0, 1, .. in  __0, __1, ... in self._colNames
             an empty postfix "" is recognized as -1 """
-        postfixes = set(getPostfix(c) for c in self._colNames)
-        postfixes.discard(None)  # internal cols starting witn __
-        return [-1 if p == "" else int(p[2:]) for p in postfixes]
+        # joins ask for min and max postfix, so we cache the values until the next
+        # call of resetInternals:
+        values = self.__dict__.get("_postfixes")
+        if values is None:
+            values = [-1 if p == "" else int(p[2:]) for p in self.findPostfixes()]
+            self._postfixes = values
+        return values
 
     def maxPostfix(self):
         """ returns last postfix in sorted postfixes of column names """
@@ -1391,12 +1772,13 @@ class Table(object):
     def _incrementedPostfixes(self, by):
         newColNames = []
         for c in self._colNames:
-            pf = getPostfix(c)
-            if pf is not None:
-                val = -1 if pf == "" else int(pf[2:])
-                prefix = c if pf == "" else c.split("__")[0]
-                newName = prefix + "__" + str(by + val)
-            newColNames.append(newName)
+            if getPostfix(c) is None:
+                # internal columns starting with "__" keep their name
+                newColNames.append(c)
+                continue
+            prefix, __, pf = c.partition("__")
+            val = int(pf) if pf else -1
+            newColNames.append("%s__%d" % (prefix, by + val))
         return newColNames
 
     def _buildJoinTable(self, t, title):
@@ -1425,22 +1807,22 @@ class Table(object):
 
         ix = [i for i, f in enumerate(self._colFormats) if f is not None]
 
+        # the maximal lengths of the formatted values are cached until resetInternals
+        # or _resetRowCaches is called:
+        cache = self.__dict__.setdefault("_columnCache", dict())
         colwidths = []
         for i in ix:
             c = self._colNames[i]
-            f = self.colFormatters[i]
-            values = set(map(f, self.getColumn(c).values))
-            values.discard(None)
-            if values:
-                mw = max(len(v) for v in values if v is not None)
-            else:
-                mw = 1  # for "-"
+            mw = cache.get(("print_", i))
+            if mw is None:
+                f = self.colFormatters[i]
+                lengths = [len(v) for v in map(f, self._columnValues(i)) if v is not None]
+                mw = cache["print_", i] = max(lengths) if lengths else 1  # 1 is for "-"
             colwidths.append(max(mw, len(c), w))
 
         # inner method is private, else the object can not be pickled !
-        def _p(vals, colwidths=colwidths, out=out):
-            for v, w in zip(vals, colwidths):
-                expr = "%%-%ds" % w
+        def _p(vals, exprs=["%%-%ds" % w for w in colwidths], out=out):
+            for v, expr in zip(vals, exprs):
                 v = "-" if v is None else v
                 print >> out, (expr % v),
 
@@ -1456,8 +1838,7 @@ class Table(object):
         print >> out
         ct = [self._colTypes[i] for i in ix]
 
-        _p(re.match("<(type|class) '((\w|[.])+)'>|(\w+)", str(n)).groups()[1] or str(n)
-           for n in ct)
+        _p(_typeName(n) for n in ct)
         print >> out
         _p(["------"] * len(ix))
         print >> out
@@ -1513,15 +1894,11 @@ class Table(object):
             raise Exception("colName is not a string. The arguments of this "
                             "function changed in the past !")
 
-        values = convert_list_to_overall_type(list(iterable))
+        values, common_type = convert_list_to_overall_type(list(iterable))
         if type_ is None:
-            type_ = common_type_for(values)
+            type_ = common_type
         if format_ == "":
             format_ = guessFormatFor(colName, type_)
-        if meta is None:
-            meta = dict()
-        else:
-            meta = meta.copy()
         rows = [[v] for v in values]
         return Table([colName], [type_], [format_], rows, meta=meta)
 
@@ -1555,7 +1932,7 @@ class Table(object):
             else:
                 conv = lambda v: None if v == "None" else bestConvert(v)
 
-            rows = [[conv(c.strip()) for c in row] for row in reader]
+            rows = [map(conv, map(str.strip, row)) for row in reader]
 
         columns = [[row[i] for row in rows] for i in range(len(colNames))]
         types = [common_type_for(col) for col in columns]
@@ -1579,11 +1956,14 @@ class Table(object):
 
         if "feature_id" in self._colNames:
             # feature table from openms
-            ti = self.splitBy("feature_id")
-            # intensity, rt, mz should be the same value for each feature table:
-            areas = [t0.intensity.values[0] for t0 in ti]
-            rts = [t0.rt.values[0] for t0 in ti]
-            mzs = [t0.mz.values[0] for t0 in ti]
+            # intensity, rt, mz should be the same value for each feature, so we take
+            # the first row of every feature instead of splitting the table:
+            first_rows = OrderedDict()
+            ix = self.getIndex("feature_id")
+            for row in self.rows:
+                first_rows.setdefault(row[ix], row)
+            get = itemgetter(*[self.getIndex(n) for n in ("intensity", "rt", "mz")])
+            areas, rts, mzs = zip(*map(get, first_rows.values())) or ((), (), ())
         else:
             # chromatographic peak table from XCMS
             if "into" in self._colNames:
@@ -1598,11 +1978,12 @@ class Table(object):
 
         fm = pyopenms.FeatureMap()
 
+        areas = [1000.0 if area is None else area for area in areas]
         for (mz, rt, area) in zip(mzs, rts, areas):
             f = pyopenms.Feature()
             f.setMZ(mz)
             f.setRT(rt)
-            f.setIntensity(area if area is not None else 1000.0)
+            f.setIntensity(area)
             fm.push_back(f)
         return fm
 
@@ -1641,12 +2022,24 @@ class Table(object):
         for table in tables:
             missing_names = [c for c in final_colnames if c not in table._colNames]
             if missing_names:
-                table = table.copy()
-                for name in missing_names:
-                    type_ = start_with.getType(name)
-                    format_ = start_with.getFormat(name)
-                    table._addColumnWithoutNameCheck(name, None, type_, format_)
-            table = table.extractColumns(*final_colnames)
+                # instead of copying the table and adding the missing columns one after
+                # the other we pick the values from the rows padded with one None:
+                padding = len(table._colNames)
+                indices = [table.getIndex(c) if c in table._colNames else padding
+                           for c in final_colnames]
+                types = [table._colTypes[i] if i < padding else start_with.getType(c)
+                         for (c, i) in zip(final_colnames, indices)]
+                formats = [table._colFormats[i] if i < padding else start_with.getFormat(c)
+                           for (c, i) in zip(final_colnames, indices)]
+                if len(indices) > 1:
+                    get = itemgetter(*indices)
+                    rows = [list(get(row + [None])) for row in table.rows]
+                else:
+                    rows = [[None] for row in table.rows]
+                table = Table._create(final_colnames, types, formats, rows, table.title,
+                                      table.meta)
+            else:
+                table = table.extractColumns(*final_colnames)
             extended_tables.append(table)
 
         result = extended_tables[0]
@@ -1680,12 +2073,27 @@ class Table(object):
             update(self._colTypes)
             update(self._colFormats)
             update(self.meta)
-            for row in self.rows:
-                for val in row:
-                    if isinstance(val, (Table, PeakMap, Blob)):
-                        h.update(val.uniqueId())
+            # if every column holds only ints, only floats or only strings, the columns
+            # are hashed as single buffers, pickling every single value dominates the
+            # runtime else. this changes the ids of such tables compared to emzed
+            # versions which hashed all tables row by row. other tables are still
+            # hashed row by row and keep their ids:
+            columns = self._pickledColumns()
+            if columns and all(_isHomogeneousColumn(values) for values in columns):
+                for values in columns:
+                    if isinstance(values, np.ndarray):
+                        h.update("%s:%d:" % (values.dtype.str, len(values)))
+                        h.update(values.data)
                     else:
-                        update(val)
+                        h.update("str:%d:" % len(values))
+                        h.update("".join("%d:%s" % (len(v), v) for v in values))
+            else:
+                for row in self.rows:
+                    for val in row:
+                        if isinstance(val, (Table, PeakMap, Blob)):
+                            h.update(val.uniqueId())
+                        else:
+                            update(val)
             self.meta["unique_id"] = h.hexdigest()
         return self.meta["unique_id"]
 
@@ -1701,29 +2109,49 @@ class Table(object):
         #
         # PeakMap.uniqueId() *is sensitive for the content of the peakmap* but would slow down
         # calls of hash(peak_map).
-        peak_maps = dict()
+        #
+        # columns of numerical types or str can not hold peakmaps, so we skip them:
+        indices = [i for i, t in enumerate(self._colTypes)
+                   if t not in _basic_num_types and t is not str]
+        # the same instance usually appears in many rows, so we first collect the distinct
+        # instances by their id(). in the common case of a single instance there is
+        # nothing to compress and we neither compute uniqueId() nor touch the rows:
+        instances = OrderedDict()
+        add_instance = instances.setdefault
         for row in self.rows:
-            for cell in row:
+            for i in indices:
+                cell = row[i]
                 if isinstance(cell, PeakMap):
-                    peak_maps[cell.uniqueId()] = cell
+                    add_instance(id(cell), cell)
+        if len(instances) <= 1:
+            return
+
+        # setdefault registers and looks up the first instance with a given content in
+        # one call:
+        register = dict().setdefault
+        by_id = dict((id_, register(peak_map.uniqueId(), peak_map))
+                     for (id_, peak_map) in instances.items())
         for row in self.rows:
-            for i, cell in enumerate(row):
+            for i in indices:
+                cell = row[i]
                 if isinstance(cell, PeakMap):
-                    row[i] = peak_maps[cell.uniqueId()]
-        self.resetInternals()
-
-    @staticmethod
-    def _conv_nan(val):
-        try:
-            is_nan = np.isnan(val)  # does not work for str values etc !
-            return None if is_nan else val
-        except:
-            return val
+                    row[i] = by_id[id(cell)]
+        self._resetRowCaches()
 
     def to_pandas(self):
         """ converts table to pandas DataFrame object """
         import pandas
-        data = dict((name, getattr(self, name).values) for name in self.getColNames())
+        data = dict()
+        for i, name in enumerate(self._colNames):
+            column = None
+            if self._colTypes[i] in _basic_num_types:
+                column = self._currentColumnArray(i)
+            # pandas infers the dtype of columns with missing values from the values,
+            # numerical columns without missing values can be passed as typed arrays:
+            if column is not None and column.dtype != object:
+                data[name] = column
+            else:
+                data[name] = self.getColumn(name).values
         return pandas.DataFrame(data, columns=self.getColNames())
 
     @staticmethod
@@ -1760,41 +2188,53 @@ class Table(object):
 
         col_names = df.columns.values.tolist()
 
-        col_types = [types.get(n) for n in col_names]
-
         kinds_to_type = dict(i=int, f=float, O=object, V=object, U=unicode, a=str, u=int, b=bool,
                              c=complex)
 
-        # overwrite not declared types by guessing from dtype:
-        col_types = [kinds_to_type.get(dt.kind) if t is None and hasattr(dt, "kind") else t
-                     for (t, dt) in zip(col_types, df.dtypes)]
-
-        # some numpy types have no kind, as numpy.float64
-        col_types = [float if t is None and float in dt.__class__.__mro__ else t
-                     for (t, dt) in zip(col_types, df.dtypes)]
-
-        col_types = [int if t is None and int in dt.__class__.__mro__ else t
-                     for (t, dt) in zip(col_types, df.dtypes)]
-
-        rows = df.as_matrix().tolist()
-
-        rows = [map(Table._conv_nan, row) for row in rows]
-
-        for i, t in enumerate(col_types[:]):
-            if t in (object, None):
-                column = [row[i] for row in rows]
-                t = common_type_for(column)
-                col_types[i] = t
+        col_types = []
+        for n, dt in zip(col_names, df.dtypes):
+            t = types.get(n)
+            # overwrite not declared types by guessing from dtype:
+            if t is None and hasattr(dt, "kind"):
+                t = kinds_to_type.get(dt.kind)
+            # some numpy types have no kind, as numpy.float64
+            if t is None and float in dt.__class__.__mro__:
+                t = float
+            if t is None and int in dt.__class__.__mro__:
+                t = int
+            col_types.append(t)
+
+        # we convert the columns one by one, as the matrix of the data frame would have
+        # one common dtype, e.g. int values would be converted to floats:
+        columns = []
+        for i in range(len(col_names)):
+            series = df.iloc[:, i]
+            mask = None
+            if series.dtype.kind in "biufc":
+                column = np.asarray(series)
+            elif series.dtype.kind == "O":
+                column = np.asarray(series)
+                # pandas finds missing values in object columns without a python level
+                # loop:
+                mask = series.isnull().values
+            else:
+                # np.asarray would convert datetimes and timedeltas to integers:
+                column = series.astype(object).values
+            columns.append(_columnWithoutNans(column, mask=mask))
+        rows = _rowsFromColumns(columns, len(df))
 
         _formats = {int: "%d", float: "%f", str: "%s", object: None, bool: "%s"}
         if formats is not None:
             _formats.update(formats)
 
-        # first resolve types by name
-        col_formats = [_formats.get(n) for n in col_names]
-        # then by type
-        col_formats = [_formats.get(t, "%s") if f is None else f
-                       for (f, t) in zip(col_formats, col_types)]
+        col_formats = []
+        for i, (n, t) in enumerate(zip(col_names, col_types)):
+            if t in (object, None):
+                t = common_type_for(columns[i])
+                col_types[i] = t
+            # first resolve format by name, then by type:
+            f = _formats.get(n)
+            col_formats.append(_formats.get(t, "%s") if f is None else f)
 
         table = Table(col_names, col_types, col_formats, rows, title, meta)
         return table
@@ -1811,16 +2251,7 @@ class Table(object):
         """
         assert isinstance(data, np.ndarray)
         assert data.ndim == 2, data.ndim
-        rows = [map(Table._conv_nan, row) for row in data.tolist()]
-
-        table = Table(col_names, col_types, col_formats, rows, title, meta)
-        rows = []
-        for row in table.rows[:]:
-            for i, t in enumerate(col_types):
-                if t in (int, float, str):
-                    val = row[i]
-                    if val is not None:
-                        row[i] = t(val)
-            rows.append(row)
-        table.rows = rows
-        return table
+        assert data.shape[1] == len(col_types), "number of columns does not match"
+        columns = [_columnWithoutNans(column, t) for (column, t) in zip(data.T, col_types)]
+        rows = _rowsFromColumns(columns, len(data))
+        return Table(col_names, col_types, col_formats, rows, title, meta)
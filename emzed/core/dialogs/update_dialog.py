@@ -8,9 +8,10 @@ from PyQt4.QtGui import (QTableWidget, QTableWidgetItem, QDialog, QTextEdit, QPu
 
 class UpdateDialog(QDialog):
 
-    def __init__(self, update_script):
+    def __init__(self, update_script, num_updates=None):
         super(UpdateDialog, self).__init__(None, Qt.Window)
         self.updates_to_run = []
+        self._next_row = 0
         self.setWindowTitle("emzed updates")
         self.setWindowModality(Qt.WindowModal)
         self.setMinimumWidth(600)
@@ -18,6 +19,8 @@ class UpdateDialog(QDialog):
         self.setup_widgets()
         self.setup_layout()
         self.connect_signals()
+        if num_updates is not None:
+            self.reserve(num_updates)
 
         wd = QApplication.desktop().width()
         hd = QApplication.desktop().height()
@@ -33,7 +36,7 @@ class UpdateDialog(QDialog):
 
             def run(self, script=self.update_script, parent=self):
                 try:
-                    for method, args in script(parent.add_info_line, parent.add_update_info):
+                    for method, args in script(parent.add_info_line, parent.add_update_infos):
                         self.emit(SIGNAL("execute_method(PyQt_PyObject, PyQt_PyObject)"), method, args)
                 except:
                     import traceback
@@ -56,6 +59,8 @@ class UpdateDialog(QDialog):
         meth(*args)
 
     def start_to_interact(self):
+        # remove rows which were reserved but not filled:
+        self.updates.setRowCount(self._next_row)
         self.ok_button.setEnabled(True)
 
     def setup_widgets(self):
@@ -99,14 +104,43 @@ class UpdateDialog(QDialog):
         item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsUserCheckable | Qt.ItemIsSelectable)
         return item
 
+    def begin_batch(self):
+        # avoids relayout and repaint of the table for every single cell we set:
+        self._sorting_was_enabled = self.updates.isSortingEnabled()
+        self.updates.setSortingEnabled(False)
+        self.updates.setUpdatesEnabled(False)
+        self.updates.blockSignals(True)
+
+    def end_batch(self):
+        self.updates.blockSignals(False)
+        self.updates.setUpdatesEnabled(True)
+        self.updates.setSortingEnabled(self._sorting_was_enabled)
+
+    def reserve(self, n):
+        """ sets the number of rows of the updates table in advance, so that
+        add_update_info does not have to insert rows one by one """
+        self.updates.setRowCount(max(n, self._next_row))
+
     def add_update_info(self, updater_id, info, with_checkbox=True):
-        i = self.updates.rowCount()
-        self.updates.insertRow(i)
+        i = self._next_row
+        self._next_row += 1
+        if i >= self.updates.rowCount():
+            self.updates.setRowCount(i + 1)
         self.updates.setItem(i, 0, self._item(updater_id, False))
         self.updates.setItem(i, 1, self._item(info, False))
         if True or with_checkbox:
             self.updates.setItem(i, 2, self._item("", True))
 
+    def add_update_infos(self, update_infos):
+        """ adds all rows at once, so the table is painted only once """
+        self.reserve(self._next_row + len(update_infos))
+        self.begin_batch()
+        try:
+            for args in update_infos:
+                self.add_update_info(*args)
+        finally:
+            self.end_batch()
+
     def add_info_line(self, txt):
         self.info.append(txt)
 
@@ -115,12 +149,11 @@ class UpdateDialog(QDialog):
 
     def accept(self):
         for i in range(self.updates.rowCount()):
-            updater_id = str(self.updates.item(i, 0).text())
             item = self.updates.item(i, 2)
-            if item is not None:  # some cells in column are empty
-                checked = self.updates.item(i, 2).checkState() == Qt.Checked
-                if checked:
-                    self.updates_to_run.append(updater_id)
+            if item is None:  # some cells in column are empty
+                continue
+            if item.checkState() == Qt.Checked:
+                self.updates_to_run.append(str(self.updates.item(i, 0).text()))
         super(UpdateDialog, self).accept()
 
 if __name__ == "__main__":
@@ -52,7 +52,7 @@ class ChromatogramExplorer(EmzedDialog):
 
         self.peakmap = pm.getDominatingPeakmap()
 
-        self.rts = np.array([s.rt for s in self.peakmap.spectra])
+        self.rts = np.array(self.peakmap.allRts())
 
         mzvals = np.hstack([spec.peaks[:, 0] for spec in pm.spectra])
         self.absMinMZ = np.min(mzvals)
@@ -64,6 +64,7 @@ class DeleteRowAction(TableAction):
         table = self.model.table
         self.memory = table.rows[self.rowIdx][:]
         del table.rows[self.rowIdx]
+        table._resetRowCaches()
         self.endDelete()
         return True
 
@@ -72,6 +73,7 @@ class DeleteRowAction(TableAction):
         table = self.model.table
         self.beginInsert(self.rowIdx)
         table.rows.insert(self.rowIdx, self.memory)
+        table._resetRowCaches()
         self.endInsert()
 
 
@@ -87,6 +89,7 @@ class CloneRowAction(TableAction):
         self.beginInsert(self.rowIdx + 1)
         table = self.model.table
         table.rows.insert(self.rowIdx + 1, table.rows[self.rowIdx][:])
+        table._resetRowCaches()
         self.memory = True
         self.endInsert()
         return True
@@ -96,6 +99,7 @@ class CloneRowAction(TableAction):
         table = self.model.table
         self.beginDelete(self.rowIdx + 1)
         del table.rows[self.rowIdx + 1]
+        table._resetRowCaches()
         self.endDelete()
 
 
@@ -146,6 +150,7 @@ class ChangeValueAction(TableAction):
         if self.memory == self.value:
             return False
         row[self.dataColIdx] = self.value
+        table._resetRowCaches()
         self.model.emit(
             SIGNAL("dataChanged(QModelIndex,QModelIndex,PyQt_PyObject)"),
             self.idx,
@@ -157,6 +162,7 @@ class ChangeValueAction(TableAction):
         super(ChangeValueAction, self).undo()
         table = self.model.table
         table.rows[self.idx.row()][self.dataColIdx] = self.memory
+        table._resetRowCaches()
         self.model.emit(
             SIGNAL("dataChanged(QModelIndex,QModelIndex,PyQt_PyObject)"),
             self.idx,
@@ -500,8 +506,9 @@ class TableModel(QAbstractTableModel):
             rtmin = values["rtmin" + p]
             rtmax = values["rtmax" + p]
             if pm is not None and rtmin is not None and rtmax is not None:
-                for spec in pm.levelNSpecs(minLevel, maxLevel):
-                    if rtmin <= spec.rt <= rtmax:
+                # specsInRange uses binary search on the peakmaps rt values:
+                for spec in pm.specsInRange(rtmin, rtmax):
+                    if minLevel <= spec.msLevel <= maxLevel:
                         spectra.append(spec)
                         postfixes.append(p)
         return postfixes, spectra
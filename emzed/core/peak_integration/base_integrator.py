@@ -20,8 +20,7 @@ class BaseIntegrator(object):
                                 "level")
             msLevel = msLevels[0]
 
-        spectra = [s for s in self.peakMap.spectra if s.msLevel == msLevel]
-        self.allrts  = sorted([ spec.rt for spec in spectra])
+        self.allrts = sorted(spec.rt for spec in self.peakMap.levelNSpecs(msLevel))
 
         rts, chromatogram = self.peakMap.chromatogram(mzmin, mzmax, rtmin, rtmax, msLevel)
         if len(rts)==0:
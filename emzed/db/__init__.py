@@ -10,6 +10,44 @@ def _db_path(master_folder):
     return path
 
 
+def _older_db_path(master_folder):
+    """returns path of the newest pubchem db stored by an older emzed version with another
+    table format, None if there is no such db"""
+    from ..core.data_types.table import Table
+    import glob
+    import os.path
+    found = []
+    for path in glob.glob(os.path.join(master_folder, "tables_of_version_*", "pubchem.table")):
+        version_str = os.path.basename(os.path.dirname(path))[len("tables_of_version_"):]
+        try:
+            version = tuple(map(int, version_str.split(".")))
+        except ValueError:
+            continue
+        if version < Table._latest_internal_update_with_version:
+            found.append((version, path))
+    if found:
+        return max(found)[1]
+    return None
+
+
+def _convert_older_db(master_folder):
+    """tables stored by older emzed versions can still be loaded, so we convert an existing
+    pubchem db to the current table format instead of downloading it again. the older db
+    is kept for older emzed versions."""
+    from ..core.data_types.table import Table
+    import os
+    source_path = _older_db_path(master_folder)
+    if source_path is None:
+        return
+    target_path = _db_path(master_folder)
+    print "convert pubchem db from", source_path
+    table = Table.load(source_path)
+    target_dir = os.path.dirname(target_path)
+    if not os.path.exists(target_dir):
+        os.makedirs(target_dir)
+    table.store(target_path)
+
+
 def _default_pubchem_folder():
     from ..core import config
     return config.global_config.get("emzed_files_folder")
@@ -18,10 +56,13 @@ def _default_pubchem_folder():
 def _load_pubchem(folder=None):
 
     from ..core.data_bases.pubchem_db import PubChemDB
+    import os.path
 
     if folder is None:
         folder = _default_pubchem_folder()
     path = _db_path(folder)
+    if not os.path.exists(path):
+        _convert_older_db(folder)
     print "try to load pubchem db from", path
     pubchem = PubChemDB.cached_load_from(path)
     return pubchem
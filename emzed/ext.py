@@ -1,28 +1,76 @@
+import os
 import sys
-
-# rescan moudles and packages on sys.path:
+import types
 
 import pkg_resources
-reload(pkg_resources)  # migh be loaded already and is not up to date
 
-_loaded = []
+# rescanning modules and packages on sys.path is expensive, so we only do this when
+# emzed.ext is reloaded, e.g. after installing a package, or if requested explicitly:
+if (type(sys.modules[__name__]) is not types.ModuleType
+        or os.environ.get("EMZED_RELOAD_PKG_RESOURCES")):
+    reload(pkg_resources)
+
+# importing all extensions when emzed starts is slow, so we only collect the entry points
+# here and import an extension when it is accessed the first time:
+_entry_points = dict((ep.module_name, ep) for ep in
+                     pkg_resources.iter_entry_points("emzed_package", name="extension"))
+
+
+class _ExtensionsModule(types.ModuleType):
+
+    """ replaces this module in sys.modules and imports extensions on first access. it
+        also acts as import hook, so "import emzed.ext.xyz" works as before """
+
+    def __getattr__(self, name):
+        # only called if regular attribute lookup fails
+        ep = self.__dict__.get("_entry_points", {}).get(name)
+        if ep is None:
+            raise AttributeError("module %r has no attribute %r" % (self.__name__, name))
+        import sys
+        pkg = ep.load()
+        setattr(self, name, pkg)
+        sys.modules["%s.%s" % (self.__name__, name)] = pkg
+        return pkg
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self.__dict__.get("_entry_points", ())))
+
+    def find_module(self, fullname, path=None):
+        prefix, __, name = fullname.rpartition(".")
+        if prefix == self.__name__ and name in self.__dict__.get("_entry_points", ()):
+            return self
+        return None
+
+    def load_module(self, fullname):
+        return getattr(self, fullname.rpartition(".")[2])
+
 
-for ep in pkg_resources.iter_entry_points("emzed_package", name="extension"):
-    pkg = ep.load()
-    _loaded.append(ep.module_name)
-    exec "%s=pkg" % ep.module_name
-    sys.modules["emzed.ext.%s" % ep.module_name] = pkg
-    del ep
-    del pkg
+if type(sys.modules[__name__]) is types.ModuleType:
+    # first import. reload() executes this file again with the dict of the replacement
+    # as globals, which then already refreshes _entry_points.
+    _module = _ExtensionsModule(__name__, __doc__)
+    _module.__file__ = __file__
+    # submodules are only looked up for packages:
+    _module.__path__ = []
+    _module._entry_points = _entry_points
+    # python clears the globals of a module when it is not referenced any more, but
+    # the methods above need them:
+    _module._original_module = sys.modules[__name__]
+    sys.modules[__name__] = _module
+    sys.meta_path.append(_module)
+    del _module
 
-if _loaded:
+if _entry_points:
     print
-    print "LOADED EMZED EXTENSIONS: ".ljust(80, "-")
+    print "EMZED EXTENSIONS: ".ljust(80, "-")
     print
-    for l in _loaded:
-        print "loaded", l
+    for _name in sorted(_entry_points):
+        print "found", _name
     print
     print "-" * 80
+    del _name
 
+del os
 del pkg_resources
 del sys
+del types
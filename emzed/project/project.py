@@ -11,22 +11,34 @@ def _get_local_package_folder(p):
     return folder
 
 
-def is_emzed_package(p):
-    """ tests if package named p exists in project home and is marked as emzed project """
+def is_emzed_package(p, local_packages=None):
+    """ tests if package named p exists in project home and is marked as emzed project.
+        callers which test many packages can provide the content of project home as
+        ``local_packages`` """
     project_home = global_config.get("project_home").strip()
-    local_packages = os.listdir(project_home)
+    if local_packages is None:
+        local_packages = os.listdir(project_home)
     if p in local_packages:
         return is_project_folder(os.path.join(project_home, p))
     return False
 
 
+def _setup_py_develop_command(flag=""):
+    """ returns argument list for running 'setup.py develop' with the running python
+        interpreter, so no shell is needed for starting the process """
+    command = [sys.executable, "setup.py", "develop"]
+    if flag:
+        command.append(flag)
+    return command
+
+
 def _run_setup_py_develop(p, flag):
     if is_emzed_package(p):
         f = _get_local_package_folder(p)
         old_dir = os.getcwd()
         try:
             os.chdir(f)
-            subprocess.call("python setup.py develop %s" % flag, shell=True)
+            subprocess.call(_setup_py_develop_command(flag))
         finally:
             os.chdir(old_dir)
     else:
@@ -271,22 +283,52 @@ def start_work(name=None):
 
     import subprocess
     import sys
-    subprocess.call(
-        "python setup.py develop", shell=True, stderr=sys.__stderr__, stdout=sys.__stdout__)
+    subprocess.call(_setup_py_develop_command(), stderr=sys.__stderr__, stdout=sys.__stdout__)
 
     from ..core.config import global_config
     global_config.set_("last_active_project", name)
     global_config.store()
 
+    required_packages = _required_packages(name)
+    if required_packages:
+        # list project home only once for all required packages:
+        project_home = global_config.get("project_home").strip()
+        local_packages = set(os.listdir(project_home))
+        for p in required_packages:
+            if is_emzed_package(p, local_packages):
+                activate(p)
+
+
+def _required_packages(name):
+    """ returns names of packages required by the project in the current working
+        directory. we read them from the egg-info folder written by 'setup.py develop'
+        and only start 'pip show' if this folder is not found """
+    import glob
+    egg_infos = glob.glob("*.egg-info")
+    if len(egg_infos) == 1:
+        import re
+        path = os.path.join(egg_infos[0], "requires.txt")
+        if not os.path.exists(path):
+            return []
+        names = []
+        with open(path) as fp:
+            for line in fp:
+                # sections as [extra] declare optional requirements
+                if line.startswith("["):
+                    break
+                # we keep the name as written, pkg_resources would replace "_" by "-":
+                match = re.match("[\w.-]+", line.strip())
+                if match:
+                    names.append(match.group())
+        return names
+
     proc = subprocess.Popen("pip show %s" % name, shell=True, stdout=subprocess.PIPE)
     stdout, __ = proc.communicate()
     for line in stdout.split("\n"):
         if line.startswith("Requires: "):
             __, __, required_packages = line.partition("Requires: ")
-            for p in required_packages.split(","):
-                p = p.strip()
-                if is_emzed_package(p):
-                    activate(p)
+            return [p.strip() for p in required_packages.split(",")]
+    return []
 
 
 def activate_last_project():
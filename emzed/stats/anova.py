@@ -68,8 +68,9 @@ def _runStatistcsOnTables(tableSet1, tableSet2, idColumn, valueColumn,
                 v = float(v)
             new_row.append(v)
 
-        result.addRow(new_row)
+        result.addRow(new_row, False)
 
+    result.resetInternals()
     return result
 
 
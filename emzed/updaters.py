@@ -122,7 +122,7 @@ def _interactive_update():
 
     registry = setup_updaters()
 
-    def script(add_info_line, add_update_info):
+    def script(add_info_line, add_update_infos):
         exchange_folder = global_config.get("exchange_folder")
         if exchange_folder:
             yield add_info_line, ("configured exchange folder is %s" % exchange_folder,)
@@ -130,6 +130,9 @@ def _interactive_update():
             yield add_info_line, ("no exchange folder configured. use emzed.config.edit() to "
                                     "configure an exchange folder",)
 
+        # we collect the update infos and fill the table of the dialog in one step
+        # at the end:
+        update_infos = []
         for name, updater in registry.updaters.items():
 
             flag, msg = updater.check_for_newer_version_on_exchange_folder()
@@ -152,12 +155,14 @@ def _interactive_update():
 
             if updater.offer_update_lookup():
                 id_, ts, info, offer_update = updater.query_update_info()
-                yield add_update_info, (name, info, offer_update)
+                update_infos.append((name, info, offer_update))
             else:
-                yield add_update_info, (name, "no update lookup today", False)
+                update_infos.append((name, "no update lookup today", False))
+
+        yield add_update_infos, (update_infos,)
 
     app = qapplication()
-    dlg = UpdateDialog(script)
+    dlg = UpdateDialog(script, num_updates=len(registry.updaters))
     dlg.exec_()
 
     for id_ in dlg.get_updates_to_run():
@@ -197,3 +197,271 @@ class TestMSTypes(object):
         assert np.all(pmt.spectra[1].peaks.flatten() == [0., 1.0, 4.0, 1.0, 5.0, 1.0])
         assert np.all(pmt.spectra[2].peaks == peaks)
         assert np.all(pmt.spectra[3].peaks.flatten() == [0., 1.0, 4.0, 1.0, 5.0, 1.0])
+
+    def test_columns_follow_modifications(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0]])
+        spectra = [Spectrum(peaks, 1.0, 1, "0"),
+                   Spectrum(peaks, 2.0, 2, "0"),
+                   Spectrum(peaks, 3.0, 1, "0")]
+        pm = PeakMap(spectra)
+        assert pm.allRts() == [1.0, 2.0, 3.0]
+        assert pm.levelOneRts() == [1.0, 3.0]
+        assert pm.rtRange() == (1.0, 3.0)
+
+        pm.shiftRt(1.0)
+        assert pm.allRts() == [2.0, 3.0, 4.0]
+        assert pm.specsInRange(3.5, 5.0) == [spectra[2]]
+
+        pm.spectra[0].msLevel = 2
+        assert pm.levelOneRts() == [4.0]
+        assert pm.levelNSpecs(2) == spectra[:2]
+
+        pm.spectra = pm.spectra[1:]
+        assert pm.allRts() == [3.0, 4.0]
+        assert pm.levelNSpecsInRange(2, 0.0, 10.0) == [spectra[1]]
+
+        # modifications of single spectra by user code:
+        pm.spectra[0] = Spectrum(peaks * 3, 3.0, 1, "0")
+        assert pm.getMsLevels() == [1]
+        assert pm.mzRange() == (1.0, 6.0)
+        for spec in pm.spectra:
+            spec.rt += 100
+        assert pm.allRts() == [103.0, 104.0]
+        assert pm.rtRange() == (103.0, 104.0)
+        assert pm.chromatogram(0, 10, 100, 200) == ([103.0, 104.0], [9.0, 3.0])
+        pm.spectra[1].peaks = pm.spectra[1].peaks[:1]
+        assert pm.chromatogram(0, 10, 100, 200) == ([103.0, 104.0], [9.0, 1.0])
+
+        # cached columns are not pickled:
+        assert "_columns_cache" not in copy.deepcopy(pm).__getstate__()
+
+    def test_chromatogram(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0], [3.0, 4.0]])
+        empty = np.zeros((0, 2))
+        spectra = [Spectrum(peaks, 1.0, 1, "0"),
+                   Spectrum(peaks * 2, 2.0, 2, "0"),
+                   Spectrum(empty, 3.0, 1, "0"),
+                   Spectrum(peaks[1:], 4.0, 1, "0"),
+                   Spectrum(empty, 5.0, 1, "0")]
+        pm = PeakMap(spectra)
+        assert pm.chromatogram(1.5, 3.0) == ([1.0, 3.0, 4.0, 5.0], [6.0, 0.0, 6.0, 0.0])
+        assert pm.chromatogram(0.0, 1.0, 2.0, 5.0) == ([3.0, 4.0, 5.0], [0.0, 0.0, 0.0])
+        assert pm.chromatogram(0.0, 9.0, msLevel=2) == ([2.0], [14.0])
+        assert pm.chromatogram(0.0, 9.0, 2.5, 2.6) == ([], [])
+
+    def test_chromatogram_limits(self):
+        # limits which are not representable as float32 must give the same result as
+        # Spectrum.intensityInRange:
+        peaks = np.array([[0.1, 1.0], [0.2, 2.0], [0.3, 4.0]])
+        spec = Spectrum(peaks, 1.0, 1, "0")
+        pm = PeakMap([spec])
+        mz01, mz03 = float(spec.peaks[0, 0]), float(spec.peaks[2, 0])
+        limits = [(0.1, 0.3), (mz01, mz03), (np.nextafter(mz01, 1.0), mz03),
+                  (mz01, np.nextafter(mz03, 0.0)), (0.0, 0.2)]
+        for mzmin, mzmax in limits:
+            __, intensities = pm.chromatogram(mzmin, mzmax)
+            assert intensities == [spec.intensityInRange(mzmin, mzmax)]
+        assert pm.chromatogram(0.1, 0.3)[1] == [3.0]
+        assert pm.chromatogram(np.nextafter(mz01, 1.0), np.nextafter(mz03, 0.0))[1] == [2.0]
+
+    def test_peaks_in_range_limits(self):
+        # limits which are not representable as float32 must not include or exclude
+        # peaks at the boundaries:
+        peaks = np.array([[0.1, 1.0], [0.2, 2.0], [0.3, 4.0]])
+        spec = Spectrum(peaks, 0.0, 1, "0")
+        mz01, mz03 = float(spec.peaks[0, 0]), float(spec.peaks[2, 0])
+        assert mz01 > 0.1 and mz03 > 0.3
+        assert len(spec.peaksInRange(0.1, 0.3)) == 2
+        assert len(spec.peaksInRange(mz01, mz03)) == 3
+        assert len(spec.peaksInRange(np.nextafter(mz01, 1.0), mz03)) == 2
+        assert len(spec.peaksInRange(mzmax=0.2)) == 1
+        assert len(spec.peaksInRange(mzmin=-1e300, mzmax=1e300)) == 3
+        assert len(spec.peaksInRange(0.35, 0.36)) == 0
+
+    def test_representing_mz_peak(self):
+        peaks = np.array([[1.0, np.e - 1.0], [2.0, np.e ** 3 - 1.0], [3.0, 1.0]])
+        spectra = [Spectrum(peaks, 1.0, 1, "0"),
+                   Spectrum(peaks[:1], 2.0, 2, "0"),
+                   Spectrum(peaks[1:], 3.0, 1, "0")]
+        pm = PeakMap(spectra)
+        assert abs(pm.representingMzPeak(0.0, 2.5, 1.0, 1.0) - 7.0 / 4.0) < 1e-6
+        assert abs(pm.representingMzPeak(0.0, 1.5, 1.0, 3.0) - 1.0) < 1e-6
+        assert abs(pm.representingMzPeak(1.5, 2.5, 1.0, 3.0) - 2.0) < 1e-6
+        assert pm.representingMzPeak(0.0, 9.0, 1.5, 1.9) is None
+        assert pm.representingMzPeak(5.0, 9.0, 0.0, 9.0) is None
+
+    def test_unique_id(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0]])
+        ids = set()
+        for rt in (1.0, 1.0 + 1e-9):
+            for precursors in ([], [(100.0, 1.0)], [(100.0 + 1e-7, 1.0)]):
+                ids.add(Spectrum(peaks, rt, 2, "0", precursors).uniqueId())
+        assert len(ids) == 6
+        assert Spectrum(peaks, 1.0, 2, "0").uniqueId() in ids
+        spec = Spectrum(peaks, 1.0, 2, "0")
+        spec.peaks = np.asfortranarray(spec.peaks)
+        assert spec.uniqueId() in ids
+
+    def test_cached_ranges(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0]])
+        spectra = [Spectrum(peaks, 1.0, 1, "0"),
+                   Spectrum(np.zeros((0, 2)), 2.0, 2, "0"),
+                   Spectrum(peaks + 1.0, 3.0, 1, "0")]
+        pm = PeakMap(spectra)
+        assert pm.getMsLevels() == [1, 2]
+        assert pm.mzRange() == (1.0, 3.0)
+        assert pm.rtRange() == (1.0, 3.0)
+
+        pm.remove(2.5, 9.0)
+        assert pm.mzRange() == (1.0, 2.0)
+        pm.shiftRt(1.0)
+        assert pm.rtRange() == (2.0, 4.0)
+        pm.spectra[1].msLevel = 3
+        assert pm.getMsLevels() == [1, 3]
+
+    def test_extract(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0], [3.0, 3.0]])
+        spectra = [Spectrum(peaks, 1.0, 1, "0"),
+                   Spectrum(peaks, 2.0, 2, "0", [(2.0, 1.0)]),
+                   Spectrum(peaks, 3.0, 1, "0")]
+        pm = PeakMap(spectra)
+        assert pm.extract(mslevelmin=2).allRts() == [2.0]
+        assert pm.extract(mslevelmax=1).allRts() == [1.0, 3.0]
+        assert pm.extract(rtmin=1.5, rtmax=3.0, mslevelmax=1).allRts() == [3.0]
+        assert pm.extract(mzmin=4.0).spectra == []
+
+        pm2 = pm.extract(mzmin=1.5, mzmax=2.5)
+        assert [len(s) for s in pm2.spectra] == [1, 1, 1]
+        # result is independent of pm:
+        pm2.spectra[1].peaks[0, 1] = 42.0
+        pm2.spectra[1].precursors.append((3.0, 1.0))
+        assert pm.spectra[1].peaks[1, 1] == 2.0
+        assert pm.spectra[1].precursors == [(2.0, 1.0)]
+
+    def test_stacked_peaks(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0]])
+        spectra = [Spectrum(peaks, 1.0, 1, "0"),
+                   Spectrum(peaks + 0.5, 2.0, 2, "0"),
+                   Spectrum(np.zeros((0, 2)), 2.5, 1, "0"),
+                   Spectrum(peaks + 1.0, 3.0, 1, "0")]
+        pm = PeakMap(spectra)
+        assert pm.all_peaks().tolist() == [[1.0, 1.0], [2.0, 2.0], [2.0, 2.0], [3.0, 3.0]]
+        assert pm.all_peaks(2).tolist() == [[1.5, 1.5], [2.5, 2.5]]
+        assert pm.all_peaks(3).shape == (0, 2)
+        assert pm.msNPeaks(1).tolist() == [[1.0, 1.0], [2.0, 2.0], [2.0, 2.0], [3.0, 3.0]]
+        assert pm.msNPeaks(1, 2.0, 3.0).tolist() == [[2.0, 2.0], [3.0, 3.0]]
+        assert pm.msNPeaks(2, 2.5, 3.0).shape == (0, 2)
+
+    def test_spectra_are_sorted(self):
+        peaks = np.array([[1.0, 1.0]])
+        spectra = [Spectrum(peaks, rt, 1, "0") for rt in (1.0, 2.0, 2.0, 3.0)]
+        assert PeakMap(spectra).spectra == spectra
+        assert PeakMap(spectra).spectra is not spectra
+        assert PeakMap(spectra[::-1]).allRts() == [1.0, 2.0, 2.0, 3.0]
+        assert PeakMap(s for s in spectra).spectra == spectra
+        assert PeakMap(spectra[2:] + spectra[:2]).spectra[1:3] == spectra[2:0:-1]
+
+    def test_peaks_layout(self):
+        peaks = np.array([[2.0, 1.0], [1.0, 2.0], [3.0, 0.0]])
+        spec = Spectrum(peaks, 0.0, 1, "0")
+        assert spec.peaks.tolist() == [[1.0, 2.0], [2.0, 1.0]]
+        assert spec.peaks.dtype == np.float32
+        assert spec.peaks[:, 0].flags.contiguous
+        assert spec.peaks[:, 1].flags.contiguous
+
+        state = spec.__getstate__()
+        state["peaks"] = np.ascontiguousarray(spec.peaks)
+        spec2 = Spectrum.__new__(Spectrum)
+        spec2.__setstate__(state)
+        assert spec2 == spec
+        assert spec2.peaks[:, 0].flags.contiguous
+
+    def test_representing_mz_peak_unsorted(self):
+        peaks = np.array([[1.0, np.e - 1.0], [2.0, np.e ** 3 - 1.0]])
+        spectra = [Spectrum(peaks[:1], 1.0, 1, "0"),
+                   Spectrum(peaks[1:], 2.0, 1, "0"),
+                   Spectrum(peaks[:1], 3.0, 1, "0")]
+        pm = PeakMap(spectra)
+        # builds the cached columns before the modification:
+        assert pm.allRts() == [1.0, 2.0, 3.0]
+        spectra[1].rt = 5.0
+        assert abs(pm.representingMzPeak(0.0, 9.0, 1.0, 3.0) - 1.0) < 1e-6
+
+    def test_extract_unique_ids(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0], [3.0, 3.0]])
+        pm = PeakMap([Spectrum(peaks, 1.0, 1, "0"), Spectrum(peaks, 2.0, 1, "0")])
+        pm_id = pm.uniqueId()
+        spec_id = pm.spectra[0].uniqueId()
+
+        pm2 = pm.extract(rtmin=0.5)
+        assert pm2.spectra[0].meta["unique_id"] == spec_id
+        assert pm2.uniqueId() == pm_id
+
+        pm3 = pm.extract(mzmin=1.5)
+        assert pm3.spectra[0].uniqueId() != spec_id
+        assert pm3.uniqueId() != pm_id
+        assert pm3.spectra[0].peaks[:, 0].flags.contiguous
+
+    def test_pickle_spectrum(self):
+        import cPickle
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0]])
+        spec = Spectrum(peaks, 1.0, 2, "+", [(1.0, 2.0)])
+        spec.uniqueId()
+        for protocol in (0, 2):
+            spec2 = cPickle.loads(cPickle.dumps(spec, protocol=protocol))
+            assert spec2 == spec
+            assert spec2.meta == spec.meta
+            assert spec2.peaks[:, 0].flags.contiguous
+
+        # state as pickled by versions before Spectrum had __slots__:
+        state = dict(peaks=np.ascontiguousarray(spec.peaks), rt=1.0, msLevel=2,
+                     polarity="+", precursors=[(1.0, 2.0)])
+        spec3 = Spectrum.__new__(Spectrum)
+        spec3.__setstate__(state)
+        assert spec3 == spec
+        assert spec3.meta == dict()
+
+        spec4 = copy.copy(spec)
+        spec4.rt = 2.0
+        assert spec.rt == 1.0
+
+    def test_rt_queries_for_unsorted_rts(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0]])
+        spectra = [Spectrum(peaks, rt, 1 + i % 2, "0") for i, rt in enumerate((1.0, 2.0, 3.0, 4.0))]
+        pm = PeakMap(spectra)
+        assert pm.specsInRange(1.5, 3.0) == spectra[1:3]
+        assert pm.levelNSpecsInRange(1, 1.5, 3.0) == spectra[2:3]
+        assert pm.extract(rtmin=1.5, mslevelmax=1).allRts() == [3.0]
+
+        # modifications of rt can break the order of spectra:
+        spectra[0].rt = 3.5
+        assert pm.specsInRange(1.5, 3.0) == spectra[1:3]
+        assert pm.specsInRange(3.0, 4.0) == [spectra[0], spectra[2], spectra[3]]
+        assert pm.levelNSpecsInRange(1, 3.0, 4.0) == [spectra[0], spectra[2]]
+        assert pm.chromatogram(0.0, 9.0, 3.0, 4.0, 1) == ([3.5, 3.0], [3.0, 3.0])
+        assert pm.extract(rtmin=3.2, mslevelmax=1).allRts() == [3.5]
+
+    def test_remove_keeps_peaks_layout(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0], [3.0, 3.0]])
+        pm = PeakMap([Spectrum(peaks, 1.0, 1, "0")])
+        pm.remove(1.5, 2.5)
+        assert pm.spectra[0].peaks.tolist() == [[1.0, 1.0], [3.0, 3.0]]
+        assert pm.spectra[0].peaks[:, 0].flags.contiguous
+
+    def test_remove_with_empty_spectra(self):
+        peaks = np.array([[1.0, 1.0], [2.0, 2.0], [3.0, 3.0]])
+        spectra = [Spectrum(peaks, 0.0, 1, "0"),
+                   Spectrum(peaks[:1], 1.0, 1, "0"),
+                   Spectrum(np.zeros((0, 2)), 1.5, 2, "0"),
+                   Spectrum(peaks, 2.0, 2, "0"),
+                   Spectrum(peaks, 3.0, 1, "0")]
+        pm = PeakMap(spectra)
+        pm.remove(0.5, 1.5, 0.5, 3.0)
+        assert pm.allRts() == [0.0, 2.0, 3.0]
+        assert len(pm.spectra[0].peaks) == 3
+        assert len(pm.spectra[1].peaks) == 3
+        assert pm.spectra[2].peaks.tolist() == [[2.0, 2.0], [3.0, 3.0]]
+        assert pm.chromatogram(0.0, 9.0) == ([0.0, 3.0], [6.0, 5.0])
+
+        pm.remove(5.0, 6.0)
+        assert pm.allRts() == [0.0, 2.0, 3.0]
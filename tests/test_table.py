@@ -239,6 +239,13 @@ class TestTable(unittest.TestCase):
         t = Table.load(j("test.table"))
         run(t, names, [row1, row2, row3])
 
+        t.store(j("test.table"), True, gzipped=True)
+        with open(j("test.table"), "rb") as fp:
+            assert fp.readline().startswith("emzed_version=")
+            assert fp.read(2) == "\x1f\x8b"
+        t = Table.load(j("test.table"))
+        run(t, names, [row1, row2, row3])
+
 
     def testSomePredicates(self):
         #build table
@@ -891,6 +898,12 @@ class TestTable(unittest.TestCase):
         assert t1.getColNames() == [ "a", "b", "c"]
         assert t2.getColNames() == [ "a", "c", "d"]
 
+        t3 = toTable("b", [5], format_="%.1f")
+        tn = Table.mergeTables([t3, toTable("a", [1])], reference_table=t3)
+        assert tn.getColNames() == ["b"]
+        assert tn.b.values == (5, None,)
+        assert tn.getColFormat("b") == "%.1f"
+
 
     def testApply(self):
 
@@ -36,3 +36,381 @@ def test_evalsize_of_grouped_aggregate_values():
 def test_apply_to_empty_col():
     t = emzed.utils.toTable("b", (1,))
     t.addColumn("a", t.b.apply(lambda x: None))
+
+
+def test_column_arrays_follow_modifications():
+    t = emzed.utils.toTable("a", [3, 1, None])
+    t.addColumn("b", [[1, 2], [3, 4], None])
+    a = t._columnArray(0)
+    assert a.dtype == object and a.tolist() == [3, 1, None]
+    b = t._columnArray(1)
+    assert b.shape == (3,) and b[0] == [1, 2]
+    assert (t.a >= 2).values == (True, False, None)
+
+    t.setValue(t.rows[2], "a", 2)
+    assert t._columnArray(0).dtype.kind == "i"
+    assert (t.a >= 2).values == (True, False, True)
+
+    t.addRow([4, None])
+    assert t._columnArray(0).tolist() == [3, 1, 2, 4]
+    assert len(t.filter(t.a > 1)) == 3
+
+
+def test_column_arrays_follow_in_place_edits():
+    t = emzed.utils.toTable("a", [1, 2, 3])
+    assert (t.a > 1).values == (False, True, True)
+    t.rows[0][0] = 5
+    # in place edits of rows need an explicit reset of the caches:
+    assert t._columnArray(0).tolist() == [1, 2, 3]
+    assert t._currentColumnArray(0).tolist() == [5, 2, 3]
+    t._resetRowCaches()
+    assert t._columnArray(0).tolist() == [5, 2, 3]
+    assert t.a.values == (5, 2, 3)
+    assert len(t.filter(t.a > 1)) == 3
+    t.setValue(t.rows[1], "a", 0)
+    assert t._columnArray(0).tolist() == [5, 0, 3]
+    assert t.a.values == (5, 0, 3)
+    assert len(t.filter(t.a > 1)) == 2
+
+
+def test_sort_by_mixed_values():
+    Table = emzed.core.data_types.Table
+    t = Table._create(["a"], [int], ["%s"], [[10], ["b"], [9]])
+    t.sortBy("a")
+    assert t.a.values == (9, 10, "b")
+    t.sortBy("a", ascending=False)
+    assert t.a.values == ("b", 10, 9)
+
+
+def test_sort_by_after_in_place_edit():
+    t = emzed.utils.toTable("a", [1, 2, 3])
+    t.addColumn("b", [1, 2, 3])
+    t.splitBy("a")
+    t.rows[0][0] = 0
+    t.rows[0][1] = 0
+    t.sortBy("a")
+    assert t.rows == [[0, 0], [2, 2], [3, 3]]
+    t.rows[0][0] = 4
+    t.sortBy("a")
+    assert t.rows == [[2, 2], [3, 3], [4, 0]]
+
+
+def test_split_by_mixed_keys():
+    t = emzed.utils.toTable("a", [[1, 2], None, [1, 2], None, [3]])
+    t.addColumn("b", [1, 1, 1, 1.0, 1])
+    subts = t.splitBy("a", "b")
+    assert [len(s) for s in subts] == [2, 2, 1]
+    assert subts[0].a.values == ([1, 2], [1, 2])
+    assert subts[1].a.values == (None, None)
+
+
+def test_add_row_converts_values():
+    t = emzed.utils.toTable("a", [1])
+    t.addColumn("b", ["x"])
+    t.addRow([True, 3])
+    assert t.rows[-1] == [1, "3"]
+    assert type(t.rows[-1][0]) is int
+    assert t.getValue(t.rows[-1], "c", default=42) == 42
+    assert t.getValues(t.rows[-1]).b == "3"
+
+    import pytest
+    with pytest.raises(TypeError):
+        t.addRow((2, "y"))
+    assert len(t) == 2
+
+
+def test_store_csv_with_separator_in_values(tmpdir):
+    t = emzed.utils.toTable("a", ["x;y", None, 'say "hi"'])
+    t.addColumn("b", [1.0, 2.5, None])
+    path = tmpdir.join("t.csv").strpath
+    t.storeCSV(path)
+    with open(path) as fp:
+        assert fp.readline() == "a;b\n"
+    tn = emzed.core.data_types.Table.loadCSV(path)
+    assert tn.a.values == t.a.values
+    assert tn.b.values == t.b.values
+
+
+def test_extract_columns():
+    t = emzed.utils.toTable("a", [1, 2])
+    t.addColumn("b", ["x", "y"])
+    t.addColumn("c", [None, 3.0])
+    assert t.extractColumns("c", "a").rows == [[None, 1], [3.0, 2]]
+    assert t.extractColumns("b").rows == [["x"], ["y"]]
+    t2 = t[1:]
+    t2.rows[0][0] = 5
+    assert t.rows[1][0] == 2
+
+
+def test_set_value_checks_row():
+    t = emzed.utils.toTable("a", [1, 2, 3])
+    for row in t.rows:
+        t.setValue(row, "a", 0)
+    assert t.a.values == (0, 0, 0)
+
+    t.sortBy("a", ascending=False)
+    t.rows[0] = [4]
+    t.setValue(t.rows[0], "a", 5)
+    assert t.a.values == (5, 0, 0)
+
+    import pytest
+    with pytest.raises(AssertionError):
+        t.setValue([5], "a", 1)
+
+
+def test_load_table_pickled_with_old_module_names(tmpdir):
+    import cPickle
+    import sys
+    t = emzed.utils.toTable("a", [1, 2])
+    data = cPickle.dumps(t, protocol=2)
+    data = data.replace("emzed.core.data_types.table\n", "libms.DataStructures.Table\n")
+    assert "libms.DataStructures.Table" in data
+    path = tmpdir.join("old.table").strpath
+    with open(path, "wb") as fp:
+        fp.write("version=1.3.2\n" + data)
+    tn = emzed.core.data_types.Table.load(path)
+    assert tn.a.values == (1, 2)
+    assert "libms.DataStructures.Table" not in sys.modules
+
+
+def test_split_by_numerical_keys():
+    import random
+    random.seed(42)
+    a = [random.randint(0, 3) for i in range(200)]
+    b = [random.choice([0.5, 1.0, 2]) for i in range(200)]
+    t = emzed.utils.toTable("a", a)
+    t.addColumn("b", b, type_=float)
+    t.addColumn("i", range(200))
+
+    subts = t.splitBy("a", "b")
+    keys = []
+    for subt in subts:
+        assert len(set(zip(subt.a.values, subt.b.values))) == 1
+        assert list(subt.i.values) == sorted(subt.i.values)
+        keys.append((subt.a.values[0], subt.b.values[0]))
+    expected = []
+    for key in zip(a, b):
+        if key not in expected:
+            expected.append(key)
+    assert keys == expected
+    assert sum(len(subt) for subt in subts) == 200
+
+    t.rows[0][1] = float("nan")
+    t.resetInternals()
+    assert len(t.splitBy("b")) == 4
+    assert t.splitBy("a", "b")[0].i.values == (0,)
+    assert t[:0].splitBy("a") == []
+
+
+def test_split_by_after_in_place_edit():
+    t = emzed.utils.toTable("a", [1, 2, 1])
+    assert [len(subt) for subt in t.splitBy("a")] == [2, 1]
+    t.rows[1][0] = 1
+    assert [len(subt) for subt in t.splitBy("a")] == [3]
+    t.rows[0][0] = 3
+    assert [subt.a.values for subt in t.splitBy("a")] == [(3,), (1, 1)]
+
+
+def test_column_attributes_follow_renames():
+    t = emzed.utils.toTable("a", [1, 2])
+    t.addColumn("b", [3, 4])
+    t.renameColumns(a="c")
+    assert not hasattr(t, "a")
+    assert t.c.values == (1, 2)
+    assert t.getColumn("c") is t.c
+    t.dropColumns("b")
+    assert not hasattr(t, "b")
+    import pytest
+    with pytest.raises(AttributeError):
+        t.getColumn("sortBy")
+
+
+def test_add_rows_with_deferred_reset():
+    t = emzed.utils.toTable("a", [1])
+    for i in range(3):
+        t.addRow(["2"], False)
+    t.resetInternals()
+    assert t.a.values == (1, 2, 2, 2)
+
+    import pytest
+    with pytest.raises(AssertionError):
+        t.addRow([1, 2])
+    with pytest.raises(ValueError):
+        t.addRow(["x"])
+    assert len(t) == 4
+
+
+def test_row_changes_refresh_column_values(tmpdir):
+    t = emzed.utils.toTable("a", [2, 1])
+    col = t.a
+    assert col.values == (2, 1)
+    t.setValue(t.rows[0], "a", 3)
+    assert t.a is col
+    assert col.values == (3, 1)
+    t.sortBy("a")
+    assert col.values == (1, 3)
+    t.addRow([0])
+    assert col.values == (1, 3, 0)
+
+    path = tmpdir.join("t.table").strpath
+    t.store(path)
+    tn = emzed.core.data_types.Table.load(path)
+    assert tn.a.values == (1, 3, 0)
+
+
+def test_best_convert():
+    from emzed.core.data_types.table import bestConvert
+    assert bestConvert("abc") == "abc"
+    assert bestConvert("") == ""
+    assert bestConvert(" 2") == 2
+    assert bestConvert("-3.5") == -3.5
+    assert bestConvert(",5") == 0.5
+    assert bestConvert("1,5") == 1.5
+    assert bestConvert("Inf") == float("inf")
+    assert bestConvert("name") == "name"
+    assert type(bestConvert("2.0")) is float
+    assert bestConvert("1e3") == 1000.0
+    assert bestConvert("1.2.3") == "1.2.3"
+
+
+def test_store_and_load_columns(tmpdir):
+    import cPickle
+    Table = emzed.core.data_types.Table
+    t = emzed.utils.toTable("a", [1, 2, None])
+    t.addColumn("b", [1.5, float("inf"), -0.0], type_=float)
+    t.addColumn("c", [1, 2.0, True], type_=object)
+    t.addColumn("d", ["x", [1], None])
+    path = tmpdir.join("t.table").strpath
+    t.store(path)
+    tn = Table.load(path)
+    assert tn.version == Table._latest_internal_update_with_version
+    assert tn.rows == t.rows
+    assert [map(type, row) for row in tn.rows] == [map(type, row) for row in t.rows]
+
+    # emzed versions before 2.0.3 do not know this class and fail to load the file:
+    from emzed.core.data_types.table import _ColumnsOfTableFormat_2_0_3
+    with open(path, "rb") as fp:
+        fp.readline()
+        assert isinstance(cPickle.load(fp)[-1], _ColumnsOfTableFormat_2_0_3)
+
+    t = Table([], [], [], [[], []])
+    t.store(path, forceOverwrite=True)
+    assert Table.load(path).rows == [[], []]
+
+    # layout of tables stored by emzed 2.0.2
+    t = emzed.utils.toTable("a", [1, 2])
+    with open(path, "wb") as fp:
+        fp.write("emzed_version=2.0.2\n")
+        data = (t._colNames, t._colTypes, t._colFormats, t.title, t.meta, t.rows)
+        cPickle.dump(data, fp, protocol=2)
+    tn = Table.load(path)
+    assert tn.a.values == (1, 2)
+
+
+def test_unique_id_follows_values():
+    def create(b_values):
+        t = emzed.utils.toTable("a", [1, 2, 3])
+        t.addColumn("b", b_values, type_=object)
+        t.addColumn("c", ["x", "yz", ""])
+        return t
+
+    ids = [create(values).uniqueId() for values in ([1.0, 2.0, 3.0], [1, 2, 3],
+                                                      [1.0, 2.0, None], [1.0, 2.0, 4.0])]
+    assert len(set(ids)) == len(ids)
+    assert create([1.0, 2.0, 3.0]).uniqueId() == ids[0]
+
+    t1 = emzed.utils.toTable("a", ["x", "y"])
+    t2 = emzed.utils.toTable("a", ["x:", "y"])
+    assert t1.uniqueId() != t2.uniqueId()
+
+
+def test_add_column_dispatch():
+    import numpy as np
+
+    class OldStyle:
+        pass
+
+    class OldStyleCallable:
+        def __call__(self, table, row, name):
+            return row[0] + 1
+
+    t = emzed.utils.toTable("a", [1, 2])
+    t.addColumn("b", t.a * 2)
+    t.addColumn("c", lambda t, r, n: r[0] + 3)
+    t.addColumn("d", (v for v in (5, 6)))
+    t.addColumn("e", np.arange(7, 9))
+    t.addColumn("f", OldStyleCallable())
+    o = OldStyle()
+    t.addColumn("g", o)
+    assert t.rows == [[1, 2, 4, 5, 7, 2, o], [2, 4, 5, 6, 8, 3, o]]
+
+
+def test_print_widths_follow_modifications():
+    import cStringIO
+    t = emzed.utils.toTable("a", ["x"])
+
+    def header_width():
+        out = cStringIO.StringIO()
+        t.print_(w=1, out=out)
+        return len(out.getvalue().split("\n")[0])
+
+    assert header_width() == 1
+    t.setValue(t.rows[0], "a", "xyz")
+    assert header_width() == 3
+    t.addRow(["abcde"])
+    assert header_width() == 5
+    t.rows[0][0] = "abcdefg"
+    # in place edits of rows need an explicit reset of the caches:
+    assert header_width() == 5
+    t.resetInternals()
+    assert header_width() == 7
+    t.setColFormat("a", "%.2s")
+    assert header_width() == 2
+
+
+def test_postfix_values_follow_renames():
+    Table = emzed.core.data_types.Table
+    t = Table._create(["a", "b__0", "c__3"], [int] * 3, ["%d"] * 3, [[1, 2, 3]])
+    assert (t.minPostfix(), t.maxPostfix()) == (-1, 3)
+    t.dropColumns("a")
+    assert (t.minPostfix(), t.maxPostfix()) == (0, 3)
+    t.removePostfixes()
+    assert (t.minPostfix(), t.maxPostfix()) == (-1, -1)
+
+
+def test_compress_peakmaps_hashes_instances_once():
+    import numpy as np
+    from emzed.core.data_types import PeakMap, Spectrum
+
+    calls = []
+
+    class CountingPeakMap(PeakMap):
+
+        def uniqueId(self):
+            calls.append(id(self))
+            return super(CountingPeakMap, self).uniqueId()
+
+    def create():
+        return CountingPeakMap([Spectrum(np.arange(12).reshape(-1, 2), 1.0, 1, "+")])
+
+    pm, pm2 = create(), create()
+    t = emzed.utils.toTable("pm", [pm, pm2, pm, pm2, pm])
+    t.addColumn("x", range(5))
+    t.compressPeakMaps()
+    assert len(set(map(id, t.pm.values))) == 1
+    assert sorted(calls) == sorted([id(pm), id(pm2)])
+
+
+def test_compress_single_peakmap_skips_hashing():
+    import numpy as np
+    from emzed.core.data_types import PeakMap, Spectrum
+
+    class UnhashablePeakMap(PeakMap):
+
+        def uniqueId(self):
+            raise AssertionError("uniqueId should not be computed")
+
+    pm = UnhashablePeakMap([Spectrum(np.arange(12).reshape(-1, 2), 1.0, 1, "+")])
+    t = emzed.utils.toTable("pm", [pm, pm, None])
+    t.compressPeakMaps()
+    assert t.pm.values == (pm, pm, None)
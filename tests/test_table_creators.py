@@ -21,6 +21,44 @@ def test_pandas():
     assert lines[5].strip() == "3        -        c        3.0      -"
 
 
+def test_pandas_keeps_int_columns():
+    import pandas
+    from emzed.core.data_types import Table
+    df = pandas.DataFrame(dict(a=[1, 2], b=[1.5, None]), columns=["a", "b"])
+    t = Table.from_pandas(df)
+    assert t.getColTypes() == [int, float]
+    assert t.rows == [[1, 1.5], [2, None]]
+    assert [type(v) for v in t.a.values] == [int, int]
+
+
+def test_pandas_keeps_datetime_columns():
+    import pandas
+    from emzed.core.data_types import Table
+    df = pandas.DataFrame(dict(a=[1, 2], d=pandas.to_datetime(["2014-01-01", "2014-01-02"]),
+                               td=pandas.to_timedelta([1, 2], unit="s")),
+                          columns=["a", "d", "td"])
+    t = Table.from_pandas(df)
+    assert t.getColTypes() == [int, pandas.Timestamp, pandas.Timedelta]
+    assert t.d.values == (pandas.Timestamp("2014-01-01"), pandas.Timestamp("2014-01-02"))
+    assert t.td.values[1] == pandas.Timedelta(seconds=2)
+
+
+def test_to_pandas():
+    import numpy as np
+    from emzed.core.data_types import Table
+    t = Table(["a", "b", "c", "d"], [int, float, int, str], ["%s"] * 4,
+              [[1, 2.0, None, "x"], [2, 3.5, 3, None]])
+    df = t.to_pandas()
+    assert df.columns.tolist() == ["a", "b", "c", "d"]
+    assert df.dtypes.tolist() == [np.int64, np.float64, np.float64, object]
+    assert df.values.tolist()[1] == [2, 3.5, 3.0, None]
+
+    # the data frame must not share memory with the table:
+    df["a"] += 1
+    assert t.a.values == (1, 2)
+    assert t.to_pandas()["a"].tolist() == [1, 2]
+
+
 def test_np_array():
     import numpy as np
     import emzed
@@ -29,3 +67,22 @@ def test_np_array():
                                                      ["%.2f", "%d", "%s"])
 
     assert t.rows == [[1.0, 2, "a"], [1.0, 3, "b"], [2.0, None, None]]
+
+
+def test_np_float_array():
+    import numpy as np
+    import emzed
+    a = np.array([[1.0, np.nan], [np.nan, 2.5]])
+    t = emzed.core.data_types.Table.from_numpy_array(a, ["a", "b"], [float, float],
+                                                     ["%.2f", "%.2f"])
+    assert t.rows == [[1.0, None], [None, 2.5]]
+    assert type(t.rows[0][0]) is float
+
+
+def test_np_object_array():
+    import numpy as np
+    import emzed
+    a = np.array([["a", np.nan], [np.float32("nan"), 3]], dtype=object)
+    t = emzed.core.data_types.Table.from_numpy_array(a, ["a", "b"], [object, object],
+                                                     [None, None])
+    assert t.rows == [["a", None], [None, 3]]